@@ -0,0 +1,170 @@
+import asyncio
+import os
+
+from apis import jmp_snapshot
+from utils import http_client
+from utils.storage import load_json, save_json
+
+endpoint = jmp_snapshot.endpoint
+
+MANIFEST_FILE = "asset_manifest.json"
+# HEAD requests in flight while building the manifest
+MANIFEST_CONCURRENCY = int(os.getenv('MANIFEST_CONCURRENCY', 8))
+# Attempts per asset before giving up on a timed out or failed request
+MANIFEST_ATTEMPTS = int(os.getenv('MANIFEST_ATTEMPTS', 3))
+# Result of _resolve for an asset the upstream does not have
+MISSING = "missing"
+
+"""
+    Character assets resolved for every character, in the order they are tried.
+    Assets that do not exist for a character (404) fall back to the big icon.
+"""
+CHARACTER_ASSETS = ["icon-big", "constellation", "talent-na", "talent-skill", "talent-burst"]
+
+"""
+    Map of asset keys to their final (validated) urls for one jmp.blue data version.
+
+    {
+        "version": str - jmp.blue snapshot version the manifest was built for,
+        "assets": dict(key: url),
+        "missing": list of keys - Assets the upstream answered with a 404,
+    }
+
+    Assets whose requests kept failing are neither, so they keep their
+    entry from the previous manifest or fall back to their own url.
+
+    Keys:
+        character/<url name>/<asset>
+        book/<book name>
+        artifact/<artifact set id>
+"""
+manifest = load_json(MANIFEST_FILE) or {"version": None, "assets": {}, "missing": []}
+_missing = set(manifest.get("missing", []))
+_build_task = None
+# Coroutine functions called with the data version whenever a manifest is built
+_build_listeners = []
+
+"""
+    Register a coroutine function called with the data version every time a
+    manifest is built, e.g. to drop renders holding urls from the previous one.
+"""
+def on_build(listener):
+    _build_listeners.append(listener)
+    return listener
+
+def character_key(url_name: str, asset: str):
+    return f"character/{url_name}/{asset}"
+
+def book_key(book: str):
+    return f"book/{book.lower()}"
+
+def artifact_key(set_id: str):
+    return f"artifact/{set_id}"
+
+"""
+    Look up an asset url in the manifest. Never does any network I/O.
+
+    Parameters:
+    key: str - Asset key.
+    default: str - Url returned if the asset is not in the manifest.
+
+    Returns:
+    url - Asset url.
+"""
+def get_asset(key: str, default: str = None):
+    return manifest["assets"].get(key, default)
+
+def get_character_asset(url_name: str, asset: str):
+    key = character_key(url_name, asset)
+    if asset != "icon-big" and key in _missing:
+        return get_character_asset(url_name, "icon-big")
+    return get_asset(key, endpoint + f"/characters/{url_name}/{asset}")
+
+"""
+    Validate an asset url with a HEAD request, retrying timeouts and errors.
+
+    Returns:
+    str - Final url of the asset, MISSING if the upstream answered with a 404,
+        or None if every attempt failed.
+"""
+async def _resolve(url: str, semaphore: asyncio.Semaphore):
+    for attempt in range(MANIFEST_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(2 ** attempt)
+        try:
+            async with semaphore:
+                response = await http_client.head(url)
+        except Exception:
+            continue
+        if response.status == 200:
+            return response.url
+        if response.status == 404:
+            return MISSING
+    return None
+
+"""
+    Build the manifest for the current snapshot version by validating every
+    asset url with a HEAD request, then persist it.
+
+    Returns:
+    dict - The new manifest.
+"""
+async def build_manifest():
+    global manifest
+    version = jmp_snapshot.get_version()
+    urls = {}
+    for url_name in jmp_snapshot.get_all_characters():
+        for asset in CHARACTER_ASSETS:
+            urls[character_key(url_name, asset)] = endpoint + f"/characters/{url_name}/{asset}"
+    for book in await jmp_snapshot.get_talent_books():
+        urls[book_key(book)] = endpoint + f"/materials/talent-book/guide-to-{book.lower()}"
+    try:
+        artifacts = await http_client.get_json(endpoint + "/artifacts")
+    except Exception:
+        artifacts = []
+    for set_id in artifacts:
+        urls[artifact_key(set_id)] = endpoint + f"/artifacts/{set_id}/flower-of-life"
+
+    keys = list(urls.keys())
+    # Queued requests would otherwise use up their timeout waiting for a pooled connection
+    semaphore = asyncio.Semaphore(MANIFEST_CONCURRENCY)
+    resolved = await asyncio.gather(*[_resolve(urls[key], semaphore) for key in keys])
+    assets = {}
+    missing = []
+    failed = 0
+    for key, url in zip(keys, resolved):
+        if url == MISSING:
+            missing.append(key)
+        elif url:
+            assets[key] = url
+        else:
+            failed += 1
+            if key in manifest["assets"]:
+                assets[key] = manifest["assets"][key]
+
+    manifest = {"version": version, "assets": assets, "missing": missing}
+    _missing.clear()
+    _missing.update(missing)
+    save_json(MANIFEST_FILE, manifest)
+    print(f"Asset manifest built for version {version} ({len(assets)}/{len(keys)} assets, {len(missing)} missing, {failed} failed)")
+    for listener in _build_listeners:
+        await listener(version)
+    return manifest
+
+async def _rebuild(version: str):
+    if manifest.get("version") != version:
+        await build_manifest()
+
+"""
+    Build the manifest in the background if it is missing or out of date.
+    Safe to call more than once.
+"""
+def start_build():
+    global _build_task
+    version = jmp_snapshot.get_version()
+    if version and manifest.get("version") != version and (_build_task is None or _build_task.done()):
+        _build_task = asyncio.get_event_loop().create_task(build_manifest())
+    return _build_task
+
+# Rebuild once per new jmp.blue data version
+jmp_snapshot.on_version_change(_rebuild)
@@ -0,0 +1,81 @@
+import asyncio
+import datetime
+
+from apis import jmp_snapshot
+from apis.genshin_dev import get_daily_talent_books_embeds, get_next_server_reset, get_server_day
+from utils.constants import SERVER_REGIONS
+
+"""
+    Talent book embeds for the current in-game day of every server region.
+
+    dict(region: dict("day": str, "embeds": list of Embeds))
+"""
+daily_books = {}
+_schedule_task = None
+
+"""
+    Build and store the talent book embeds for a region's current day.
+
+    Parameters:
+    region: str - Server region (America, Europe, Asia).
+
+    Returns:
+    list of Embeds
+"""
+async def build_region(region: str):
+    day = get_server_day(region)
+    embeds = await get_daily_talent_books_embeds(region)
+    daily_books[region] = {"day": day, "embeds": embeds}
+    return embeds
+
+async def build_all_regions(version: str = None):
+    for region in SERVER_REGIONS:
+        await build_region(region)
+
+"""
+    Get the talent book embeds for a region's current day.
+
+    The embeds are normally prepared by the scheduler at the region's reset;
+    they are only built here if the scheduler has not caught up yet.
+
+    Parameters:
+    region: str - Server region (America, Europe, Asia).
+
+    Returns:
+    list of Embeds
+"""
+async def get_books_embeds(region: str):
+    stored = daily_books.get(region)
+    if stored is None or stored["day"] != get_server_day(region):
+        return await build_region(region)
+    return stored["embeds"]
+
+async def _schedule_loop():
+    try:
+        await build_all_regions()
+    except Exception as e:
+        print(f"Failed to build talent books: {e}")
+    while True:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        resets = {region: get_next_server_reset(region, now) for region in SERVER_REGIONS}
+        next_reset = min(resets.values())
+        await asyncio.sleep((next_reset - now).total_seconds())
+        for region, reset in resets.items():
+            if reset == next_reset:
+                try:
+                    await build_region(region)
+                except Exception as e:
+                    print(f"Failed to build talent books for {region}: {e}")
+
+"""
+    Start building the talent book embeds at every region's daily reset.
+    Safe to call more than once.
+"""
+def start_schedule():
+    global _schedule_task
+    if _schedule_task is None or _schedule_task.done():
+        _schedule_task = asyncio.get_event_loop().create_task(_schedule_loop())
+    return _schedule_task
+
+# Talent books or their icons may change with a new data version
+jmp_snapshot.on_version_change(build_all_regions)
@@ -0,0 +1,70 @@
+"""
+    Parsed genshin.jmp.blue character document.
+
+    A record is loaded once per command and passed to every formatter in
+    genshin_dev, so a single /skills invocation reads the character only once.
+"""
+class CharacterRecord:
+    __slots__ = (
+        "url_name",
+        "name",
+        "vision",
+        "skill_talents",
+        "passive_talents",
+        "constellations",
+    )
+
+    def __init__(
+            self,
+            url_name: str,
+            name: str,
+            vision: str,
+            skill_talents: list,
+            passive_talents: list,
+            constellations: list,
+            ):
+        self.url_name = url_name
+        self.name = name
+        self.vision = vision
+        self.skill_talents = skill_talents
+        self.passive_talents = passive_talents
+        self.constellations = constellations
+
+    """
+        Build a record from a genshin.jmp.blue character document.
+
+        Parameters:
+        url_name: str - url-friendly character name.
+        character: dict - Character document.
+
+        Returns:
+        CharacterRecord
+    """
+    @classmethod
+    def from_document(cls, url_name: str, character: dict):
+        return cls(
+            url_name=url_name,
+            name=character["name"],
+            vision=character["vision"],
+            skill_talents=character.get("skillTalents", []),
+            passive_talents=character.get("passiveTalents", []),
+            constellations=character.get("constellations", []),
+        )
+
+    """
+        Get the combat talent unlocked as the given skill type.
+
+        Parameters:
+        type: str - CharacterSkills value (Normal Attack, Elemental Skill, Elemental Burst).
+
+        Returns:
+        dict - Combat talent, or None if the character has no such talent.
+    """
+    def get_talent(self, type: str):
+        for talent in self.skill_talents:
+            if talent['unlock'] == type:
+                return talent
+        return None
+
+    def __repr__(self):
+        return f"CharacterRecord({self.url_name!r}, {self.name!r}, {self.vision!r})"
@@ -0,0 +1,159 @@
+import bisect
+import re
+
+from apis import jmp_snapshot
+from utils.constants import CHAR_TO_URL, CHARACTER_ALIASES
+
+"""
+    In-memory character name index built from the jmp.blue snapshot.
+
+    Every character is indexed under its display name, its url name, each word
+    of its name and its aliases. Lookups are exact matches first, then prefix
+    matches (binary search over the sorted names), then trigram similarity for
+    typos.
+"""
+# normalized name -> url name
+_names = {}
+# sorted normalized names, for prefix search
+_sorted_names = []
+# trigram -> set of url names
+_trigrams = {}
+# url name -> display name
+_display_names = {}
+# url name -> autocomplete label, the display name made unique (e.g. "Traveler (Geo)")
+_labels = {}
+
+def normalize(name: str):
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+def _ngrams(text: str, n: int = 3):
+    padded = f"  {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+"""
+    Rebuild the index from the characters in the snapshot.
+"""
+def build_index(version: str = None):
+    global _names, _sorted_names, _trigrams, _display_names, _labels
+    names = {}
+    trigrams = {}
+    display_names = {}
+    visions = {}
+
+    def add(name: str, url_name: str):
+        key = normalize(name)
+        if not key:
+            return
+        names.setdefault(key, url_name)
+        for gram in _ngrams(key):
+            trigrams.setdefault(gram, set()).add(url_name)
+
+    characters = jmp_snapshot.get_all_characters()
+    # url names first, so they always resolve to their own character
+    for url_name in characters:
+        add(url_name, url_name)
+    for url_name, character in characters.items():
+        display_name = character.get("name", url_name)
+        display_names[url_name] = display_name
+        visions[url_name] = character.get("vision")
+        add(display_name, url_name)
+        for word in display_name.split():
+            add(word, url_name)
+    for alias_map in (CHAR_TO_URL, CHARACTER_ALIASES):
+        for alias, url_name in alias_map.items():
+            if url_name in display_names:
+                add(alias, url_name)
+
+    _names, _trigrams, _display_names = names, trigrams, display_names
+    _labels = _build_labels(display_names, visions)
+    _sorted_names = sorted(names)
+
+def _build_labels(display_names: dict, visions: dict):
+    by_name = {}
+    for url_name, display_name in display_names.items():
+        by_name.setdefault(display_name, []).append(url_name)
+    labels = {}
+    for display_name, url_names in by_name.items():
+        if len(url_names) == 1:
+            labels[url_names[0]] = display_name
+            continue
+        # e.g. one Traveler per element, told apart by vision (or url name if that is shared too)
+        suffixes = [visions.get(url_name) for url_name in url_names]
+        if None in suffixes or len(set(suffixes)) < len(suffixes):
+            suffixes = url_names
+        for url_name, suffix in zip(url_names, suffixes):
+            labels[url_name] = f"{display_name} ({suffix})"
+    return labels
+
+def get_display_name(url_name: str):
+    return _display_names.get(url_name, url_name)
+
+"""
+    Get the autocomplete label of a character: its display name, with the
+    vision added when several characters share it.
+"""
+def get_label(url_name: str):
+    return _labels.get(url_name, get_display_name(url_name))
+
+"""
+    Resolve a character name, alias or unambiguous prefix to its url name.
+
+    Parameters:
+    name: str - User provided character name.
+
+    Returns:
+    str - url name, or None if no character matches.
+"""
+def resolve(name: str):
+    key = normalize(name)
+    if key in _names:
+        return _names[key]
+    matches = _prefix_matches(key)
+    if len(matches) == 1:
+        return matches[0]
+    return None
+
+def _prefix_matches(key: str):
+    matches = []
+    i = bisect.bisect_left(_sorted_names, key)
+    while i < len(_sorted_names) and _sorted_names[i].startswith(key):
+        url_name = _names[_sorted_names[i]]
+        if url_name not in matches:
+            matches.append(url_name)
+        i += 1
+    return matches
+
+"""
+    Search characters by name for autocomplete.
+
+    Parameters:
+    query: str - Partial character name.
+    limit: int - Maximum number of results (Discord allows 25 choices).
+
+    Returns:
+    list of str - url names, best matches first.
+"""
+def search(query: str, limit: int = 25):
+    key = normalize(query)
+    if not key:
+        return sorted(_display_names, key=get_display_name)[:limit]
+    results = _prefix_matches(key)
+    if len(results) < limit:
+        # rank the rest by trigram overlap to tolerate typos
+        query_grams = _ngrams(key)
+        scores = {}
+        for gram in query_grams:
+            for url_name in _trigrams.get(gram, ()):
+                scores[url_name] = scores.get(url_name, 0) + 1
+        ranked = sorted(scores, key=lambda url_name: (-scores[url_name], get_display_name(url_name)))
+        min_score = max(1, len(query_grams) // 3)
+        for url_name in ranked:
+            if scores[url_name] >= min_score and url_name not in results:
+                results.append(url_name)
+    return results[:limit]
+
+async def _on_version_change(version: str):
+    build_index(version)
+
+build_index()
+jmp_snapshot.on_version_change(_on_version_change)
@@ -0,0 +1,246 @@
+import asyncio
+import datetime
+import os
+import random
+
+import genshin
+
+from apis.genshin_api import DAILY_REWARD_HOST, create_client, hoyolab_slots
+from utils.mongo_db import (
+    get_auto_claim_user_ids, get_daily_claim, get_daily_claim_batch, get_users, save_daily_claim_batch,
+    save_daily_claims, update_user)
+from utils import metrics
+from utils.rate_limit import RateLimiter
+
+# Daily check-in resets at midnight UTC+8
+DAILY_RESET_UTC_OFFSET = 8
+# Seconds after the reset before the batch starts
+DAILY_CLAIM_DELAY = int(os.getenv('DAILY_CLAIM_DELAY', 5 * 60))
+# Number of concurrent claim workers
+DAILY_CLAIM_WORKERS = int(os.getenv('DAILY_CLAIM_WORKERS', 5))
+# Claims per second across all hosts, and per HoyoLab host
+DAILY_CLAIM_RATE = float(os.getenv('DAILY_CLAIM_RATE', 5))
+DAILY_CLAIM_HOST_RATE = float(os.getenv('DAILY_CLAIM_HOST_RATE', 2))
+# Attempts per user before giving up, and base backoff (seconds) between attempts
+DAILY_CLAIM_ATTEMPTS = int(os.getenv('DAILY_CLAIM_ATTEMPTS', 3))
+DAILY_CLAIM_BACKOFF = float(os.getenv('DAILY_CLAIM_BACKOFF', 2))
+# Number of results buffered before they are written to Mongo in bulk
+DAILY_CLAIM_BATCH_SIZE = int(os.getenv('DAILY_CLAIM_BATCH_SIZE', 100))
+# Seconds before retrying a batch that failed (e.g. Mongo was unreachable)
+DAILY_CLAIM_RETRY = int(os.getenv('DAILY_CLAIM_RETRY', 15 * 60))
+
+global_limiter = RateLimiter(DAILY_CLAIM_RATE, burst=DAILY_CLAIM_WORKERS)
+host_limiters = {}
+
+"""
+    Progress and throughput of the current (or last) batch.
+"""
+progress = {
+    "date": None,
+    "total": 0,
+    "done": 0,
+    "claimed": 0,
+    "already_claimed": 0,
+    "failed": 0,
+    "retries": 0,
+    "started_at": None,
+    "finished_at": None,
+}
+_task = None
+
+def get_claim_date(now: datetime.datetime = None):
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return (now.astimezone(datetime.timezone.utc) + datetime.timedelta(hours=DAILY_RESET_UTC_OFFSET)).date().isoformat()
+
+def get_next_reset(now: datetime.datetime = None):
+    now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(datetime.timezone.utc)
+    reset = now.replace(hour=0, minute=0, second=0, microsecond=0) - datetime.timedelta(hours=DAILY_RESET_UTC_OFFSET)
+    while reset <= now:
+        reset += datetime.timedelta(days=1)
+    return reset
+
+def get_throughput():
+    if not progress["started_at"]:
+        return 0.0
+    end = progress["finished_at"] or datetime.datetime.now(datetime.timezone.utc)
+    elapsed = (end - progress["started_at"]).total_seconds()
+    return progress["done"] / elapsed if elapsed > 0 else 0.0
+
+def _get_host_limiter(host: str):
+    if host not in host_limiters:
+        host_limiters[host] = RateLimiter(DAILY_CLAIM_HOST_RATE, burst=1)
+    return host_limiters[host]
+
+"""
+    Claim one user's daily reward, retrying transient errors with exponential backoff.
+
+    Returns:
+    dict - Claim result to store.
+"""
+async def claim_for_user(discord_id: str, cookies: dict, date: str):
+    client = create_client(cookies)
+    result = {"discord_id": discord_id, "date": date}
+    for attempt in range(DAILY_CLAIM_ATTEMPTS):
+        await global_limiter.acquire()
+        await _get_host_limiter(DAILY_REWARD_HOST).acquire()
+        try:
+            async with hoyolab_slots:
+                with metrics.track_upstream(DAILY_REWARD_HOST):
+                    await client.claim_daily_reward()
+            result.update(status="claimed", message="Daily rewards claimed.")
+            break
+        except genshin.AlreadyClaimed:
+            result.update(status="already_claimed", message="Daily rewards already claimed.")
+            break
+        except genshin.errors.InvalidCookies:
+            result.update(status="failed", message="Invalid HoyoLab cookies, please /authenticate again.")
+            break
+        except Exception as e:
+            result.update(status="failed", message=str(e))
+            if attempt + 1 < DAILY_CLAIM_ATTEMPTS:
+                progress["retries"] += 1
+                await asyncio.sleep(DAILY_CLAIM_BACKOFF * 2 ** attempt + random.uniform(0, 1))
+    result["claimed_at"] = datetime.datetime.now(datetime.timezone.utc)
+    return result
+
+def _update_metrics():
+    for state in ("total", "done", "claimed", "already_claimed", "failed", "retries"):
+        metrics.daily_claims.set(progress[state], state=state)
+    metrics.daily_claims_throughput.set(get_throughput())
+
+async def _flush(results: list):
+    batch = results[:]
+    results.clear()
+    try:
+        await save_daily_claims(batch)
+    except Exception as e:
+        # Keep the results for the next (or the final) save
+        print(f"Could not save {len(batch)} daily reward results: {e}")
+        results.extend(batch)
+
+async def _worker(queue: asyncio.Queue, results: list, date: str):
+    while True:
+        discord_id, cookies = await queue.get()
+        try:
+            result = await claim_for_user(discord_id, cookies, date)
+            progress[result["status"]] += 1
+            results.append(result)
+            if len(results) >= DAILY_CLAIM_BATCH_SIZE:
+                await _flush(results)
+        except Exception as e:
+            print(f"Daily reward worker error for {discord_id}: {e}")
+            progress["failed"] += 1
+        finally:
+            progress["done"] += 1
+            _update_metrics()
+            queue.task_done()
+
+"""
+    Claim the daily rewards of every opted-in user.
+
+    Returns:
+    dict - Batch progress counters.
+"""
+async def run_daily_claims():
+    date = get_claim_date()
+    progress.update(
+        date=date, total=0, done=0, claimed=0, already_claimed=0, failed=0, retries=0,
+        started_at=datetime.datetime.now(datetime.timezone.utc), finished_at=None)
+
+    discord_ids = await get_auto_claim_user_ids()
+    users = await get_users(discord_ids, ["authentication_tokens"])
+    progress["total"] = len(users)
+    _update_metrics()
+
+    queue = asyncio.Queue()
+    for discord_id, user in users.items():
+        queue.put_nowait((discord_id, user.get("authentication_tokens")))
+    results = []
+    workers = [asyncio.ensure_future(_worker(queue, results, date)) for _ in range(DAILY_CLAIM_WORKERS)]
+    await queue.join()
+    for worker in workers:
+        worker.cancel()
+    await save_daily_claims(results)
+
+    progress["finished_at"] = datetime.datetime.now(datetime.timezone.utc)
+    _update_metrics()
+    await save_daily_claim_batch(date, dict(progress))
+    print(f"Daily rewards: {progress['claimed']} claimed, {progress['already_claimed']} already claimed, "
+          f"{progress['failed']} failed ({get_throughput():.1f} users/s)")
+    return progress
+
+"""
+    Get the stored result of today's daily reward claim for a user.
+
+    Parameters:
+    discord_id: int - Discord user id.
+
+    Returns:
+    str - Result message, or None if nothing was claimed for the user today
+        (failed claims are not reported, so /daily can try again).
+"""
+async def get_stored_claim_message(discord_id: int):
+    stored = await get_daily_claim(discord_id, get_claim_date())
+    if stored and stored.get("status") != "failed":
+        return stored["message"]
+    return None
+
+async def save_claim_message(discord_id: int, status: str, message: str):
+    await save_daily_claims([{
+        "discord_id": str(discord_id),
+        "date": get_claim_date(),
+        "status": status,
+        "message": message,
+        "claimed_at": datetime.datetime.now(datetime.timezone.utc),
+    }])
+
+"""
+    Opt a user in or out of the daily reward batch.
+
+    Parameters:
+    discord_id: int - Discord user id.
+    enabled: bool - Whether to claim automatically.
+
+    Returns:
+    str - Message for the user.
+"""
+async def set_auto_claim(discord_id: int, enabled: bool):
+    result = await update_user(discord_id, {"auto_claim": enabled})
+    if enabled and not result.matched_count:
+        return "Please link your HoyoLab account with /authenticate before enabling automatic claims."
+    return f"Automatic daily reward claims {'enabled' if enabled else 'disabled'}."
+
+"""
+    Get when the next batch should run: this claim date's reset +
+    DAILY_CLAIM_DELAY if it is still ahead, now if that time has passed without
+    a recorded batch (e.g. the bot was down), otherwise after the next reset.
+"""
+async def _get_next_run(now: datetime.datetime):
+    run_at = get_next_reset(now) - datetime.timedelta(days=1) + datetime.timedelta(seconds=DAILY_CLAIM_DELAY)
+    if now < run_at:
+        return run_at
+    if await get_daily_claim_batch(get_claim_date(now)) is None:
+        return now
+    return run_at + datetime.timedelta(days=1)
+
+async def _schedule_loop():
+    while True:
+        try:
+            now = datetime.datetime.now(datetime.timezone.utc)
+            run_at = await _get_next_run(now)
+            await asyncio.sleep(max(0, (run_at - now).total_seconds()))
+            await run_daily_claims()
+        except Exception as e:
+            print(f"Daily reward batch failed: {e}")
+            # The batch is not recorded, so it is retried
+            await asyncio.sleep(DAILY_CLAIM_RETRY)
+
+"""
+    Run the daily reward batch after every daily reset, and now if today's
+    batch was missed. Safe to call more than once.
+"""
+def start_daily_claims():
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.get_event_loop().create_task(_schedule_loop())
+    return _task
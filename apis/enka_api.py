@@ -1,14 +1,167 @@
-import requests
-import chompjs
+import asyncio
+import datetime
+import os
+from urllib.parse import urlparse
 
 from enkapy import Enka
-from apis.genshin_dev import get_artifact_icon, get_character_icon, get_vision
-from utils.mongo_db import get_user_from_db
+from apis import enka_assets
+from apis.genshin_dev import get_character_icon, get_vision
+from utils.mongo_db import get_user_uid
+from utils import http_client
+from utils import metrics
+from utils.cache import LRUCache
 from utils.utils import *
 from utils.constants import VISION_TO_COLOR, PROP_TO_STAT
 
 client = Enka()
 
+"""
+    Replace the shared Enka client (e.g. with a stub client in benchmarks).
+"""
+def set_client(new_client):
+    global client
+    client = new_client
+
+# Upstream localisation store, checked to decide whether the language tables must be reloaded
+ENKA_LOC_URL = os.getenv('ENKA_LOC_URL', "https://raw.githubusercontent.com/EnkaNetwork/API-docs/master/store/loc.json")
+# Hosts the Enka client talks to, for the upstream metrics
+ENKA_HOST = "enka.network"
+ENKA_LANG_HOST = urlparse(ENKA_LOC_URL).hostname
+# Seconds between checks for new Enka language data
+ENKA_LANG_REFRESH_INTERVAL = int(os.getenv('ENKA_LANG_REFRESH_INTERVAL', 6 * 60 * 60))
+
+"""
+    Set once the Enka language tables have been loaded into the shared client.
+"""
+enka_ready = asyncio.Event()
+_lang_version = None
+_lang_lock = asyncio.Lock()
+_lang_task = None
+
+async def _get_lang_version():
+    try:
+        response = await http_client.head(ENKA_LOC_URL)
+        return response.headers.get("ETag") or response.headers.get("Last-Modified")
+    except Exception:
+        return None
+
+"""
+    Load the Enka language and asset tables into the shared client, only if
+    they were never loaded or the upstream version changed.
+
+    Returns:
+        bool - True if the tables were (re)loaded.
+"""
+async def load_enka_lang():
+    global _lang_version
+    async with _lang_lock:
+        version = await _get_lang_version()
+        if enka_ready.is_set() and (version is None or version == _lang_version):
+            return False
+        with metrics.track_upstream(ENKA_LANG_HOST):
+            await client.load_lang()
+        _lang_version = version
+        enka_ready.set()
+        return True
+
+"""
+    Wait until the Enka language tables are loaded, loading them now if the
+    startup load has not run yet.
+"""
+async def ensure_enka_ready():
+    if not enka_ready.is_set():
+        await load_enka_lang()
+
+async def _lang_refresh_loop():
+    while True:
+        try:
+            if await load_enka_lang():
+                print(f"Enka language tables loaded (version {_lang_version})")
+        except Exception as e:
+            print(f"Enka language refresh failed: {e}")
+        await asyncio.sleep(ENKA_LANG_REFRESH_INTERVAL)
+
+"""
+    Load the Enka language tables at startup and reload them in the background
+    when they change upstream. Safe to call more than once.
+"""
+def start_enka_lang_refresh():
+    global _lang_task
+    if _lang_task is None or _lang_task.done():
+        _lang_task = asyncio.get_event_loop().create_task(_lang_refresh_loop())
+    return _lang_task
+
+# Number of Enka profiles kept in memory, and TTL used when Enka does not send one
+ENKA_PROFILE_CACHE_SIZE = int(os.getenv('ENKA_PROFILE_CACHE_SIZE', 1000))
+ENKA_DEFAULT_TTL = int(os.getenv('ENKA_DEFAULT_TTL', 60))
+# Maximum concurrent upstream lookups while building one showcase
+SHOWCASE_CONCURRENCY = int(os.getenv('SHOWCASE_CONCURRENCY', 4))
+
+"""
+    Enka profiles by UID. Entries outlive their TTL so they can still be served
+    (marked as stale) when Enka is rate limiting or down.
+
+    dict(uid: dict("user": EnkaUser, "fetched_at": datetime, "expires_at": datetime))
+"""
+profile_cache = metrics.register_cache("enka_profiles", LRUCache(maxsize=ENKA_PROFILE_CACHE_SIZE))
+# uid -> in-flight fetch task, so concurrent lookups of a UID share one request
+_profile_fetches = {}
+
+async def _fetch_profile(uid: str):
+    try:
+        with metrics.track_upstream(ENKA_HOST):
+            user = await client.fetch_user(uid)
+    finally:
+        _profile_fetches.pop(uid, None)
+    fetched_at = datetime.datetime.now(datetime.timezone.utc)
+    ttl = getattr(user, "ttl", None) or ENKA_DEFAULT_TTL
+    entry = {"user": user, "fetched_at": fetched_at, "expires_at": fetched_at + datetime.timedelta(seconds=ttl)}
+    profile_cache.set(uid, entry)
+    return entry
+
+"""
+    Fetch a Genshin player's Enka profile, honouring the TTL Enka returns.
+
+    Concurrent calls for the same UID share a single request. If Enka fails
+    (e.g. 429 rate limit) the last known profile is returned as stale.
+
+    Parameters:
+        uid: int - Genshin player UID
+
+    Returns:
+        tuple - (EnkaUser, datetime, bool)
+            EnkaUser - Enka profile.
+            datetime - When the profile was fetched from Enka.
+            bool - True if the profile is stale.
+"""
+async def fetch_enka_user(uid: int):
+    uid = str(uid)
+    cached = profile_cache.get(uid)
+    if cached and cached["expires_at"] > datetime.datetime.now(datetime.timezone.utc):
+        return cached["user"], cached["fetched_at"], False
+
+    task = _profile_fetches.get(uid)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_profile(uid))
+        _profile_fetches[uid] = task
+    try:
+        entry = await asyncio.shield(task)
+    except Exception:
+        if cached:
+            return cached["user"], cached["fetched_at"], True
+        raise
+    return entry["user"], entry["fetched_at"], False
+
+"""
+    Add a "last updated" marker to the footer of embeds built from a stale profile.
+"""
+def mark_stale(embeds: list, fetched_at: datetime.datetime):
+    marker = f"Last updated {fetched_at.strftime('%Y-%m-%d %H:%M')} UTC (Enka unavailable)"
+    for embed in embeds:
+        footer = embed.footer.text if embed.footer else ""
+        embed.set_footer(text=f"{footer} • {marker}" if footer else marker)
+    return embeds
+
 """
     Fetch a Genshin player's summary. If no UID is provided, default to author's UID.
 
@@ -19,15 +172,14 @@ client = Enka()
         str - Genshin player summary string containing, UID, Nickname, Level, Signature, and Abyss floor
 """
 async def get_enka_user_summary(discord_id: int, uid: int = False):
+    await ensure_enka_ready()
     # If UID is not provided, look for the author's UID
-    await client.load_lang()
 
     if not uid:
-        user = get_user_from_db(discord_id)
-        uid = user['uid']
+        uid = await get_user_uid(discord_id)
         # If no uid was found, the discord user has not linked their own genshin uid yet.
 
-    user = await client.fetch_user(uid)
+    user, fetched_at, stale = await fetch_enka_user(uid)
     nameCardId = user.player.nameCardId
     avatarId = user.player.profilePicture.avatarId
     summary_f1 = []
@@ -47,15 +199,16 @@ async def get_enka_user_summary(discord_id: int, uid: int = False):
     summary_f2 = f"Achievements: `{user.player.finishAchievementNum}` \n Spiral Abyss: `{user.player.towerFloorIndex}-{user.player.towerLevelIndex}` \n"
 
     p1_fields = [summary_f1, summary_f2]
-    p1_fields.append()
 
-    embeds = get_enka_user_summary_embeds(title=title, avatarId=avatarId, p1=p1_fields, nameCardId=nameCardId)
+    embeds = await get_enka_user_summary_embeds(title=title, avatarId=avatarId, p1=p1_fields, nameCardId=nameCardId)
+    if stale:
+        mark_stale(embeds, fetched_at)
     return embeds
 
-def get_enka_user_summary_embeds(nameCardId: int, avatarId : int, title: str, p1: list, p2=None, p3=None):
+async def get_enka_user_summary_embeds(nameCardId: int, avatarId : int, title: str, p1: list, p2=None, p3=None):
     embeds = []
 
-    nameCard = getNameCard(nameCardId)
+    nameCard = await getNameCard(nameCardId)
     profilePicture, icon = getProfilePicture(avatarId)
 
     e1 = create_embed(
@@ -83,28 +236,11 @@ def get_enka_user_summary_embeds(nameCardId: int, avatarId : int, title: str, p1
         avatarId: int - Genshin player AvatarIcon id
 
     Returns:
-        str - Genshin player profile picture url or empty string if no avatar was found
+        tuple - (profile picture url, icon url), empty strings if no avatar was found
 """
 def getProfilePicture(avatarId: int):
-    # enka network url for avatar ids to avatar icons in a js object
-    avatar_url = "https://enka.network/_app/immutable/chunks/pfps.94a09dfc.js"
-    req = requests.get(avatar_url)
-    if (req.status_code == 200):
-        js = req.content.decode('utf-8')
-        js_objs = js.replace('const n=', '').replace(';export{t as G,n as H};\n', '')
-        # only want the second object t, I don't think I care about the first one n
-        # find index of the second object
-        avatar_dict_idx = js_objs.find(',t=') + 3
-        avatar_dict_js = js_objs[avatar_dict_idx:]
-        # parse the js object into a python dictionary
-        avatar_icon_dict = chompjs.parse_js_object(avatar_dict_js)
-        # get the avatar icon url from the dictionary
-        iconPath = avatar_icon_dict[str(avatarId)]['iconPath']
-        avatar_icon_url = f"https://enka.network/ui/{iconPath}.png"
-        icon_req = requests.get(avatar_icon_url)
-        if (icon_req.status_code == 200):
-            return icon_req.url, avatar_icon_url
-    return ""
+    avatar_icon_url = enka_assets.get_avatar_icon(avatarId)
+    return avatar_icon_url, avatar_icon_url
 
 """
     Get a Genshin Account's Name Card
@@ -115,68 +251,61 @@ def getProfilePicture(avatarId: int):
     Returns:
         str - Genshin player name card url or empty string if no name card was found
 """
-def getNameCard(nameCardId: int):
-     # Namecard
-    res_url = f"https://api.ambr.top/v2/EN/namecard/{nameCardId}?vh=44F5"
-    res = requests.get(res_url).json()
-    if res["response"] == 200:
-        data = res["data"]
-        iconName = data['icon'].replace("Icon", "Pic")
-        url = f"https://api.ambr.top/assets/UI/namecard/{iconName}_P.png?vh=2024020300"
-        namecard_response = requests.get(url)
-        if namecard_response.status_code == 200:
-            return namecard_response.url
-    return ""
+async def getNameCard(nameCardId: int):
+    return await enka_assets.fetch_namecard(nameCardId)
 
 async def get_user_showcase(uid: int, discord_id: int):
+    await ensure_enka_ready()
     # If UID is not provided, look for the author's UID
-    await client.load_lang()
     if not uid:
-        user = get_user_from_db(discord_id)
-        uid = user['uid']
+        uid = await get_user_uid(discord_id)
 
-    user = await client.fetch_user(uid)
+    user, fetched_at, stale = await fetch_enka_user(uid)
     # showcase_str = f"UID: {uid}\n"
 
-    showcased_chars_combat = []
-    for character in user.characters:
-        showcased_char_combat = get_char_combat_data(character)
-
-        showcased_char_artifacts, set_bonus = get_char_artifact_data(character)
-
-        showcase_dict = {
-            "name": character.name,
-            "vision": get_vision(character.name),
-            "description": showcased_char_combat,
-            "artifacts": showcased_char_artifacts,
-            "set_bonus": set_bonus
-        }
-        showcased_chars_combat.append(showcase_dict)
+    # Resolve every character's metadata concurrently, one lookup per distinct character
+    lookups = {}
+    limit = asyncio.Semaphore(SHOWCASE_CONCURRENCY)
+    visions = await asyncio.gather(*[_get_showcase_vision(character.name, lookups, limit) for character in user.characters])
 
     showcased_embeds = []
-    for character in showcased_chars_combat:
-        page_index = showcased_chars_combat.index(character) + 1
-        icon = get_character_icon(character["name"])
-        vision_color = VISION_TO_COLOR[character["vision"]]
+    for i, (character, vision) in enumerate(zip(user.characters, visions)):
+        showcased_char_combat = get_char_combat_data(character)
+        showcased_char_artifacts, set_bonus = get_char_artifact_data(character)
+        icon = get_character_icon(character.name)
         embed = create_embed(
-            title=character["name"],
+            title=character.name,
             name=" ", 
-            text=character["description"], 
+            text=showcased_char_combat, 
             icon=icon, 
-            color=vision_color,
-            page=page_index,
-            total_pages=len(showcased_chars_combat)
+            color=VISION_TO_COLOR[vision],
+            page=i + 1,
+            total_pages=len(user.characters)
             )
         embed.add_field(
-            name=f"{character['set_bonus']}\n",
-            value='\n\n'.join(character["artifacts"]),
+            name=f"{set_bonus}\n",
+            value='\n\n'.join(showcased_char_artifacts),
             inline=False
         )
         embed.set_thumbnail(url=icon)
         showcased_embeds.append(embed)
 
+    if stale:
+        mark_stale(showcased_embeds, fetched_at)
     return showcased_embeds
 
+"""
+    Get a showcased character's vision, sharing the lookup between identical
+    characters of the same request and bounding concurrent upstream lookups.
+"""
+async def _get_showcase_vision(name: str, lookups: dict, limit: asyncio.Semaphore):
+    if name not in lookups:
+        async def lookup():
+            async with limit:
+                return await get_vision(name)
+        lookups[name] = asyncio.ensure_future(lookup())
+    return await lookups[name]
+
 def get_char_combat_data(character):
     showcased_char_combat = []
     showcased_char_combat.append(f'C{str(len(character.internal_constellations))} ')
@@ -207,8 +336,6 @@ def get_char_artifact_data(character):
     occurrence_dict = {}
     for artifact in character.artifacts:
         showcased_char_artifact = []
-        artifact_icon = get_artifact_icon(artifact.set_name)
-        
         showcased_char_artifact.append(f'**{artifact.name}**:\n ')
         showcased_char_artifact.append(f'**{artifact.main_stat.value} {PROP_TO_STAT[artifact.main_stat.prop]}**\n')
         for sub_stats in artifact.sub_stats:
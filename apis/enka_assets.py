@@ -0,0 +1,164 @@
+import asyncio
+import os
+import re
+
+import chompjs
+
+from utils import http_client
+from utils.storage import load_json, save_json
+
+# Base urls of enka.network and ambr.top (overridable, e.g. to point at the benchmark stub server)
+enka_url = os.getenv('ENKA_URL', "https://enka.network")
+ambr_url = os.getenv('AMBR_URL', "https://api.ambr.top")
+# Bundle used when the current one cannot be discovered from the enka.network page
+DEFAULT_PFPS_BUNDLE = os.getenv('ENKA_PFPS_BUNDLE_URL', f"{enka_url}/_app/immutable/chunks/pfps.94a09dfc.js")
+# Seconds between checks for a new avatar bundle
+REFRESH_INTERVAL = int(os.getenv('ENKA_ASSETS_REFRESH_INTERVAL', 24 * 60 * 60))
+
+AVATAR_INDEX_FILE = "enka_avatars.json"
+NAMECARD_INDEX_FILE = "namecards.json"
+
+"""
+    Index of Enka profile picture ids to icon paths, parsed from the pfps bundle.
+
+    {
+        "bundle": str - url (including content hash) of the parsed bundle,
+        "icons": dict(avatarId: iconPath),
+    }
+"""
+avatar_index = load_json(AVATAR_INDEX_FILE) or {"bundle": None, "icons": {}}
+
+"""
+    Index of nameCardIds to their ambr.top icon names, seeded from ambr.top's namecard list.
+
+    dict(nameCardId: icon name)
+"""
+namecard_index = load_json(NAMECARD_INDEX_FILE) or {}
+_refresh_task = None
+
+"""
+    Get the icon url for a profile picture id. Never does any network I/O.
+
+    Parameters:
+    avatarId: int - Genshin player AvatarIcon id.
+
+    Returns:
+    str - Icon url, or empty string if the id is not in the index.
+"""
+def get_avatar_icon(avatarId: int):
+    iconPath = avatar_index["icons"].get(str(avatarId))
+    if not iconPath:
+        return ""
+    return f"{enka_url}/ui/{iconPath}.png"
+
+async def _discover_bundle_url():
+    try:
+        response = await http_client.get(enka_url)
+        match = re.search(r"/_app/immutable/chunks/pfps\.[0-9a-zA-Z_-]+\.js", response.text())
+        if match:
+            return enka_url + match.group(0)
+    except Exception:
+        pass
+    return DEFAULT_PFPS_BUNDLE
+
+def parse_avatar_bundle(js: str):
+    js_objs = js.replace('const n=', '').replace(';export{t as G,n as H};\n', '')
+    # only want the second object t, I don't think I care about the first one n
+    # find index of the second object
+    avatar_dict_idx = js_objs.find(',t=') + 3
+    avatar_dict_js = js_objs[avatar_dict_idx:]
+    # parse the js object into a python dictionary
+    avatar_icon_dict = chompjs.parse_js_object(avatar_dict_js)
+    return {str(avatarId): avatar['iconPath'] for avatarId, avatar in avatar_icon_dict.items() if 'iconPath' in avatar}
+
+"""
+    Re-parse the Enka avatar bundle if its hashed url changed, and persist the index.
+
+    Returns:
+    bool - True if the index was rebuilt.
+"""
+async def refresh_avatar_index():
+    global avatar_index
+    bundle_url = await _discover_bundle_url()
+    if bundle_url == avatar_index.get("bundle") and avatar_index["icons"]:
+        return False
+    response = await http_client.get(bundle_url)
+    if response.status != 200:
+        return False
+    icons = parse_avatar_bundle(response.text())
+    avatar_index = {"bundle": bundle_url, "icons": icons}
+    save_json(AVATAR_INDEX_FILE, avatar_index)
+    print(f"Enka avatar index rebuilt from {bundle_url} ({len(icons)} icons)")
+    return True
+
+def _namecard_url(iconName: str):
+    iconName = iconName.replace("Icon", "Pic")
+    return f"{ambr_url}/assets/UI/namecard/{iconName}_P.png?vh=2024020300"
+
+"""
+    Get a name card url from the local index. Never does any network I/O.
+
+    Parameters:
+    nameCardId: int - Genshin player NameCard id.
+
+    Returns:
+    str - Name card url, or None if the id is not in the index.
+"""
+def get_namecard(nameCardId: int):
+    iconName = namecard_index.get(str(nameCardId))
+    return _namecard_url(iconName) if iconName else None
+
+"""
+    Get a name card url, fetching it from ambr.top once if the id is not in
+    the index yet (e.g. a name card added after the last seed).
+
+    Parameters:
+    nameCardId: int - Genshin player NameCard id.
+
+    Returns:
+    str - Name card url or empty string if no name card was found.
+"""
+async def fetch_namecard(nameCardId: int):
+    url = get_namecard(nameCardId)
+    if url:
+        return url
+    res = await http_client.get_json(f"{ambr_url}/v2/EN/namecard/{nameCardId}?vh=44F5")
+    if res.get("response") != 200:
+        return ""
+    namecard_index[str(nameCardId)] = res["data"]["icon"]
+    save_json(NAMECARD_INDEX_FILE, namecard_index)
+    return get_namecard(nameCardId)
+
+"""
+    Seed the name card index in bulk from ambr.top's namecard list, and persist it.
+
+    Returns:
+    int - Number of name cards in the index.
+"""
+async def refresh_namecard_index():
+    global namecard_index
+    res = await http_client.get_json(f"{ambr_url}/v2/EN/namecard")
+    if res.get("response") != 200:
+        return len(namecard_index)
+    items = res["data"]["items"]
+    namecard_index = {**namecard_index, **{str(nameCardId): item["icon"] for nameCardId, item in items.items() if item.get("icon")}}
+    save_json(NAMECARD_INDEX_FILE, namecard_index)
+    return len(namecard_index)
+
+async def _refresh_loop():
+    while True:
+        try:
+            await refresh_avatar_index()
+            await refresh_namecard_index()
+        except Exception as e:
+            print(f"Enka asset refresh failed: {e}")
+        await asyncio.sleep(REFRESH_INTERVAL)
+
+"""
+    Start the background refresh of the Enka asset indexes. Safe to call more than once.
+"""
+def start_refresh():
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.get_event_loop().create_task(_refresh_loop())
+    return _refresh_task
@@ -1,10 +1,94 @@
+import asyncio
+import os
+
+import aiohttp
 import genshin
-import requests
-from utils.constants import VISION_TO_COLOR, EMOJIS_TO_ID
+from apis import hoyolab_cache
+from utils import http_client, metrics
+from utils.cache import LRUCache
+from utils.constants import VISION_TO_COLOR, EMOJIS_TO_ID, NOTES_THUMBNAIL
 
 from utils.mongo_db import *
 from utils.utils import create_embed
 
+# Maximum number of pooled HoyoLab clients, and seconds an idle client is kept
+GENSHIN_CLIENT_POOL_SIZE = int(os.getenv('GENSHIN_CLIENT_POOL_SIZE', 500))
+GENSHIN_CLIENT_IDLE_TIMEOUT = float(os.getenv('GENSHIN_CLIENT_IDLE_TIMEOUT', 30 * 60))
+# Maximum concurrent HoyoLab requests (open sockets) across all users
+HOYOLAB_MAX_CONNECTIONS = int(os.getenv('HOYOLAB_MAX_CONNECTIONS', 20))
+# HoyoLab hosts called by genshin.py (battle chronicle, daily check-in, code redemption), for the upstream metrics
+HOYOLAB_RECORD_HOST = "bbs-api-os.hoyolab.com"
+DAILY_REWARD_HOST = "sg-hk4e-api.hoyolab.com"
+REDEEM_HOST = "sg-hk4e-api.hoyoverse.com"
+# Seconds /notes waits for the nickname before answering without it
+NOTES_NICKNAME_DEADLINE = float(os.getenv('NOTES_NICKNAME_DEADLINE', 1.5))
+
+"""
+    Authenticated genshin.Client per Discord user. Entries are evicted once idle
+    for GENSHIN_CLIENT_IDLE_TIMEOUT, or least recently used first when the pool is full.
+"""
+client_pool = metrics.register_cache("hoyolab_clients", LRUCache(maxsize=GENSHIN_CLIENT_POOL_SIZE, ttl=GENSHIN_CLIENT_IDLE_TIMEOUT))
+hoyolab_slots = asyncio.Semaphore(HOYOLAB_MAX_CONNECTIONS)
+# Connection pool shared by every HoyoLab client, so connections stay open across requests and users
+_connector = None
+
+def _get_connector():
+    global _connector
+    if _connector is None or _connector.closed:
+        _connector = aiohttp.TCPConnector(
+            limit=HOYOLAB_MAX_CONNECTIONS,
+            keepalive_timeout=http_client.HTTP_KEEPALIVE_TIMEOUT,
+        )
+    return _connector
+
+"""
+    genshin.py opens (and closes) a new aiohttp session for every request, so
+    each call paid for a new TCP and TLS handshake. Sessions are instead built
+    on the shared connector without owning it: closing them after the request
+    leaves the connection in the pool for the next one. Cookies are still sent
+    per request and never stored (DummyCookieJar), so users do not share them.
+"""
+def _use_shared_connector(client: genshin.Client):
+    cookie_manager = client.cookie_manager
+
+    def create_session(**kwargs):
+        return aiohttp.ClientSession(
+            cookie_jar=aiohttp.DummyCookieJar(),
+            connector=_get_connector(),
+            connector_owner=False,
+            proxy=cookie_manager.proxy,
+            **kwargs,
+        )
+    cookie_manager.create_session = create_session
+    return client
+
+def _create_genshin_client(cookies: dict):
+    return _use_shared_connector(genshin.Client(cookies, game=genshin.Game.GENSHIN))
+
+_client_factory = _create_genshin_client
+
+"""
+    Build a HoyoLab client from a user's cookies.
+"""
+def create_client(cookies: dict):
+    return _client_factory(cookies)
+
+"""
+    Replace the function building HoyoLab clients (e.g. with a stub client in benchmarks).
+"""
+def set_client_factory(factory):
+    global _client_factory
+    _client_factory = factory
+
+"""
+    Close the connections shared by the HoyoLab clients.
+"""
+async def close():
+    global _connector
+    if _connector is not None and not _connector.closed:
+        await _connector.close()
+    _connector = None
+
 async def main():
     data = await client.get_genshin_user(601328008)
     print(f"User has a total of {data.stats.characters} characters")
@@ -26,16 +110,69 @@ async def get_owned_characters():
 
     Parameters:
     discord_id: Discord user id.
+    cookies: dict - Optional cookies already read with the user's other fields,
+        used instead of querying them if no client is pooled.
 
     Returns: 
     genshin.Client - Genshin API client.
 """
-async def get_genshin_api_client(discord_id: int):
-    user = get_user_from_db(discord_id)
-    cookies = user['authentication_tokens']
-    client = genshin.Client(cookies, game=genshin.Game.GENSHIN)
+async def get_genshin_api_client(discord_id: int, cookies: dict = None):
+    client = client_pool.get(str(discord_id))
+    if client is None:
+        if cookies is None:
+            cookies = await get_user_cookies(discord_id)
+        client = create_client(cookies)
+    # (re)setting the entry restarts its idle timer
+    client_pool.set(str(discord_id), client)
     return client
 
+"""
+    Key a HoyoLab response by the account whose cookies fetch it and the UID.
+"""
+def _response_key(client: genshin.Client, uid: int):
+    return hoyolab_cache.account_key(client.hoyolab_id, uid)
+
+"""
+    Get a player's real-time notes (cached for a few seconds).
+"""
+async def fetch_notes(client: genshin.Client, uid: int):
+    async def fetch():
+        async with hoyolab_slots:
+            with metrics.track_upstream(HOYOLAB_RECORD_HOST):
+                return await client.get_notes(int(uid))
+    return await hoyolab_cache.cached("notes", _response_key(client, uid), fetch)
+
+"""
+    Get a player's HoyoLab record (cached for hours).
+"""
+async def fetch_genshin_user(client: genshin.Client, uid: int):
+    return await hoyolab_cache.cached("genshin_user", _response_key(client, uid), lambda: _get_genshin_user(client, uid))
+
+async def _get_genshin_user(client: genshin.Client, uid: int):
+    async with hoyolab_slots:
+        with metrics.track_upstream(HOYOLAB_RECORD_HOST):
+            return await client.get_genshin_user(int(uid))
+
+"""
+    Get a player's nickname (cached for hours, without keeping the whole record).
+"""
+async def fetch_nickname(client: genshin.Client, uid: int):
+    async def fetch():
+        # Only the nickname is cached, the record it is read from is not
+        user = await _get_genshin_user(client, uid)
+        return user.info.nickname
+    return await hoyolab_cache.cached("nickname", _response_key(client, uid), fetch)
+
+"""
+    Get a player's Spiral Abyss data (cached until the abyss season rolls over).
+"""
+async def fetch_spiral_abyss(client: genshin.Client, uid: int):
+    async def fetch():
+        async with hoyolab_slots:
+            with metrics.track_upstream(HOYOLAB_RECORD_HOST):
+                return await client.get_spiral_abyss(int(uid))
+    return await hoyolab_cache.cached("abyss", _response_key(client, uid), fetch, expires_at=hoyolab_cache.next_abyss_rollover(uid))
+
 """
     Authenticate the HoyoLab cookies and Genshin Account UID for a Discord user.
 
@@ -58,33 +195,22 @@ async def authenticate(discord_id: int, uid: int, ltuid: int, ltmid: str, ltoken
         "account_id_v2": ltuid,
         "account_mid_v2": ltmid,
         }
-    client = genshin.Client(cookies, game=genshin.Game.GENSHIN)
-    initial_user = get_user_from_db(discord_id) if get_user_from_db(discord_id) else None
+    client = create_client(cookies)
+    # Add or update the user in one atomic upsert, keeping the previous data to revert to
+    initial_user = await upsert_user_auth(discord_id, cookies, uid)
     try:
-        # add cookies to payload
-        payload = {
-            "discord_id": str(discord_id),
-            "authentication_tokens": cookies,
-        }
-        if uid:
-            payload["uid"] = uid
-
-        # 1) Check if discord user's genshin info is already in database
-        if not get_user_from_db(discord_id):
-            # 2) If not, add user to database
-            add_to_users(payload)
-        else:
-            # 3) Else update user data
-            update_user(discord_id, payload)
-
         # Check if cookies are invalid by trying to query a user
-        await client.get_genshin_user(uid)
+        async with hoyolab_slots:
+            with metrics.track_upstream(HOYOLAB_RECORD_HOST):
+                await client.get_genshin_user(uid)
 
     except genshin.errors.InvalidCookies:
         # Revert to previous user data if cookies are invalid
         if initial_user:
-            update_user(discord_id, initial_user)
+            await update_user(discord_id, initial_user)
         return "Error during HoyoLab authentication. Please check your credentials and try again."
+    # Swap the pooled client so the next command uses the new cookies
+    client_pool.set(str(discord_id), client)
     return "Successfully authenticated HoyoLab cookies/Genshin Account info."
 
 """
@@ -98,14 +224,15 @@ async def authenticate(discord_id: int, uid: int, ltuid: int, ltmid: str, ltoken
     str - Genshin player summary string.
 """
 async def get_genshin_api_user_summary(discord_id: int, uid: int = False):
+    # Read the author's UID and cookies in one query
+    author = await get_user_fields(discord_id, ["uid", "authentication_tokens"]) or {}
     if not uid:
         # Get author's UID
-        author = get_user_from_db(discord_id)
-        uid = author['uid']
+        uid = author.get("uid")
         # TODO: If no uid was found, the discord user has not linked their own genshin uid yet.
 
-    client = await get_genshin_api_client(discord_id)
-    user = await client.get_genshin_user(uid)
+    client = await get_genshin_api_client(discord_id, author.get("authentication_tokens"))
+    user = await fetch_genshin_user(client, uid)
     summary_str = f"Nickname: {user.info.nickname}\n"
     summary_str += f"UID: {uid}\n"
     summary_str += f"Days Active: {user.stats.days_active}\n"
@@ -131,13 +258,24 @@ async def get_genshin_api_user_summary(discord_id: int, uid: int = False):
 
 """
 async def get_notes_embed(discord_id: int):
-    client = await get_genshin_api_client(discord_id)
-    user = get_user_from_db(discord_id)
-    uid = user['uid']
-    
-    notes = await client.get_notes(int(uid))
-    user = await client.get_genshin_user(int(uid))
-    username = user.info.nickname
+    # One query for both the UID and the cookies the client is built from
+    user = await get_user_fields(discord_id, ["uid", "authentication_tokens"]) or {}
+    uid = user.get("uid")
+    client = await get_genshin_api_client(discord_id, user.get("authentication_tokens"))
+
+    # Notes are required, the nickname only decorates the title: fetch both at
+    # once and stop waiting for the nickname NOTES_NICKNAME_DEADLINE seconds
+    # after the start (or once the notes arrive, if later).
+    # The nickname fetch keeps running so its result is cached for next time.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + NOTES_NICKNAME_DEADLINE
+    nickname_task = asyncio.ensure_future(fetch_nickname(client, uid))
+    nickname_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    notes = await fetch_notes(client, uid)
+    try:
+        username = await asyncio.wait_for(asyncio.shield(nickname_task), timeout=max(0, deadline - loop.time()))
+    except Exception:
+        username = None
 
     resin = EMOJIS_TO_ID["original_resin"]
     realm_currency = EMOJIS_TO_ID["realm_currency"]
@@ -174,12 +312,10 @@ async def get_notes_embed(discord_id: int):
     comm_exp_str.append(f"{sum(expedition.finished for expedition in notes.expeditions)}/{len(notes.expeditions)} Expeditions Complete {expedition}\n")
     comm_exp_str = "".join(comm_exp_str)
 
-    icon_img = "https://static.wikia.nocookie.net/gensin-impact/images/7/75/Icon_Adventurer_Handbook.png/revision/latest?cb=20230427093923"
-    request = requests.get(icon_img)
-    icon = request.url
+    icon = NOTES_THUMBNAIL
 
     embed = create_embed(
-        title=f"{username}'s Notes",
+        title=f"{username}'s Notes" if username else "Notes",
         name="Commissions & Expeditions",
         text=comm_exp_str,
         color=VISION_TO_COLOR["Anemo"],
@@ -193,11 +329,15 @@ async def get_notes_embed(discord_id: int):
 
 async def claim_daily_rewards(discord_id: int):
     client = await get_genshin_api_client(discord_id)
-    await client.claim_daily_reward()
+    async with hoyolab_slots:
+        with metrics.track_upstream(DAILY_REWARD_HOST):
+            await client.claim_daily_reward()
     return "Daily rewards claimed."
 
 async def redeem_code(code: str, discord_id: int):
     client = await get_genshin_api_client(discord_id)
-    message = await client.redeem_code(code)
+    async with hoyolab_slots:
+        with metrics.track_upstream(REDEEM_HOST):
+            message = await client.redeem_code(code)
     return message
 
@@ -1,26 +1,61 @@
 import datetime
-import requests
+import os
 
-from utils.constants import WEEKDAYS, CHAR_TO_URL, VISION_TO_COLOR, CharacterSkills
-from utils.utils import create_embed
+from apis import asset_manifest, character_search, jmp_snapshot
+from apis.character_record import CharacterRecord
+from utils import metrics
+from utils.cache import LRUCache
+from utils.constants import WEEKDAYS, CHAR_TO_URL, VISION_TO_COLOR, SERVER_REGIONS, SERVER_RESET_HOUR, DEFAULT_SERVER_REGION, CharacterSkills
+from utils.utils import create_embed, get_embeds_size
 
-endpoint = "https://genshin.jmp.blue"
+endpoint = jmp_snapshot.endpoint
+
+# Memory budget (bytes) for pre-rendered /skills embeds
+SKILLS_CACHE_MAX_BYTES = int(os.getenv('SKILLS_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+def _embeds_size(rendered: tuple):
+    embeds, _ = rendered
+    return get_embeds_size(embeds)
+
+"""
+    Finished /skills embeds keyed by (url name, CharacterSkills value, jmp.blue data version).
+"""
+skills_cache = metrics.register_cache("skills", LRUCache(max_bytes=SKILLS_CACHE_MAX_BYTES, sizeof=_embeds_size))
 
 def get_characters():
-    response = requests.get(endpoint + "/characters")
-    characters = response.json()
-    return characters
+    return list(jmp_snapshot.get_all_characters().keys())
 
-def get_character(name: str):
+async def get_character(name: str):
     # check if character name is in CHAR_TO_URL, not case sensitive
     url_name = get_char_url_name(name)
-    characters = get_characters()
-    for character in characters:
-        if character.lower() == url_name.lower():
-            response = requests.get(endpoint + f"/characters/{url_name}")
-            char = response.json()
-            return char
-    raise Exception(f"Character {name} not found.")
+    character = await jmp_snapshot.get_character(url_name)
+    if character is None:
+        raise Exception(f"Character {name} not found.")
+    return character
+
+"""
+    Load a character once and parse it into a CharacterRecord.
+
+    Parameters:
+    name: str - Character name.
+
+    Returns:
+    CharacterRecord - Parsed character.
+"""
+async def get_character_record(name: str):
+    # Unknown names are rejected from the index without any network round trip
+    if character_search.resolve(name) is None and jmp_snapshot.get_all_characters():
+        raise_character_not_found(name)
+    url_name = get_char_url_name(name)
+    character = await jmp_snapshot.get_character(url_name)
+    if character is None:
+        raise_character_not_found(name)
+    return CharacterRecord.from_document(url_name, character)
+
+def raise_character_not_found(name: str):
+    suggestions = [character_search.get_display_name(url_name) for url_name in character_search.search(name, limit=3)]
+    hint = f" Did you mean {', '.join(suggestions)}?" if suggestions else ""
+    raise Exception(f"Character {name} not found.{hint}")
 
 """
     Get the normal attack, skill, and burst talents of a Genshin Impact character.
@@ -37,10 +72,9 @@ def get_character(name: str):
             "upgrades": list of dict("name": str, "value": str)
         }
 """
-def get_char_combat_talents(name: str):
-    character = get_character(name)
-    skillTalents = character["skillTalents"]
-    return skillTalents
+async def get_char_combat_talents(name: str):
+    record = await get_character_record(name)
+    return record.skill_talents
 
 """
     Get the constellations of a Genshin Impact character.
@@ -57,10 +91,9 @@ def get_char_combat_talents(name: str):
             "level": int
         }
 """
-def get_char_cons_list(name: str):
-    character = get_character(name)
-    cons = character["constellations"]
-    return cons
+async def get_char_cons_list(name: str):
+    record = await get_character_record(name)
+    return record.constellations
 
 """
     Get the character's  combat talents, passive talents, or constellations info.
@@ -74,10 +107,59 @@ def get_char_cons_list(name: str):
         list of Embeds - list of embeds for the character's combat talents, passive talents, or constellations.
         bool - True if the talent has scalings, False if not.
 """
-def embed_char_skill_info(name: str, type: str):
-    character = get_character(name)
+async def embed_char_skill_info(name: str, type: str):
+    key = (get_char_url_name(name), type, jmp_snapshot.get_version())
+    rendered = skills_cache.get(key)
+    if rendered is None:
+        record = await get_character_record(name)
+        rendered = create_skill_embeds(record, type)
+        if isinstance(rendered, tuple):
+            skills_cache.set(key, rendered)
+    return rendered
+
+"""
+    Render and cache the embeds of every skill type for every character in the snapshot.
+
+    Returns:
+    int - Number of cached renders.
+"""
+async def warm_skills_cache(version: str = None):
+    version = version or jmp_snapshot.get_version()
+    for url_name, character in jmp_snapshot.get_all_characters().items():
+        try:
+            record = CharacterRecord.from_document(url_name, character)
+            for skill in CharacterSkills:
+                skills_cache.set((url_name, skill.value, version), create_skill_embeds(record, skill.value))
+        except (KeyError, IndexError, TypeError) as e:
+            print(f"Could not pre-render {url_name}: {e}")
+    return len(skills_cache)
+
+async def _on_version_change(version: str):
+    # Renders from older data versions can never be hit again
+    skills_cache.clear()
+    await warm_skills_cache(version)
+
+jmp_snapshot.on_version_change(_on_version_change)
+
+async def _on_manifest_build(version: str):
+    # Renders hold the asset urls of the manifest they were made with
+    skills_cache.clear()
+    await warm_skills_cache(version)
+
+asset_manifest.on_build(_on_manifest_build)
+
+"""
+    Build the embeds for one of a character's skill types.
+
+    Parameters:
+    record: CharacterRecord - Loaded character.
+    type: str - Type of skill. (Normal Attack, Elemental Skill, Elemental Burst, Passive, Constellations)
 
-    char_name = character["name"]
+    Returns:
+    tuple - (list of Embeds, bool), see embed_char_skill_info.
+"""
+def create_skill_embeds(record: CharacterRecord, type: str):
+    char_name = record.name
     skills = [skill.value for skill in CharacterSkills]
     talents = []
     scalings = False
@@ -88,24 +170,24 @@ def embed_char_skill_info(name: str, type: str):
         return f"Invalid skill type. Please choose from {skills}"
     else:
         if type == CharacterSkills.NORMAL_ATTACK.value:
-            talents = character["skillTalents"]
+            talents = record.skill_talents
             result_str = format_normal_attack(talents)
-            embed_icon = get_talent_na_icon(name)
-            upgrades_str, scalings = get_talent_upgrades(character, type)
+            embed_icon = asset_manifest.get_character_asset(record.url_name, "talent-na")
+            upgrades_str, scalings = get_talent_upgrades(record, type)
         elif type == CharacterSkills.ELEMENTAL_SKILL.value:
-            talents = character["skillTalents"]
+            talents = record.skill_talents
             result_str = format_e_skill(talents)
-            embed_icon = get_talent_skill_icon(name)
-            upgrades_str, scalings = get_talent_upgrades(character, type)
+            embed_icon = asset_manifest.get_character_asset(record.url_name, "talent-skill")
+            upgrades_str, scalings = get_talent_upgrades(record, type)
         elif type == CharacterSkills.ELEMENTAL_BURST.value:
-            talents = character["skillTalents"]
+            talents = record.skill_talents
             result_str = format_e_burst(talents)
-            embed_icon = get_talent_burst_icon(name)
-            upgrades_str, scalings = get_talent_upgrades(character, type)
+            embed_icon = asset_manifest.get_character_asset(record.url_name, "talent-burst")
+            upgrades_str, scalings = get_talent_upgrades(record, type)
         elif type == CharacterSkills.PASSIVE_TALENTS.value:
-            return create_passive_talent_embed(name)
+            return create_passive_talent_embed(record)
         elif type == CharacterSkills.CONSTELLATIONS.value:
-            return create_constellations_embed(name)
+            return create_constellations_embed(record)
 
     # If it's too long, redirect link to wiki
     if len(result_str) > 800:
@@ -119,7 +201,7 @@ def embed_char_skill_info(name: str, type: str):
         title=f"{char_name}: {type}",
         icon=embed_icon,
         text=result_str,
-        color=VISION_TO_COLOR[get_vision(name)],
+        color=VISION_TO_COLOR[record.vision],
         page=1,
         total_pages=2 if scalings else 1
     )
@@ -132,7 +214,7 @@ def embed_char_skill_info(name: str, type: str):
             title=f"{char_name}: {type}",
             icon=embed_icon,
             text=upgrades_str,
-            color=VISION_TO_COLOR[get_vision(name)],
+            color=VISION_TO_COLOR[record.vision],
             page=2,
             total_pages=2
         )
@@ -143,19 +225,18 @@ def embed_char_skill_info(name: str, type: str):
 def create_combat_talent_embed(name: str):
     pass
 
-def create_passive_talent_embed(name: str):
-    character = get_character(name)
-    char_name = character["name"]
-    list = character["passiveTalents"]
+def create_passive_talent_embed(record: CharacterRecord):
+    char_name = record.name
+    list = record.passive_talents
     passive_talents_list = format_passive_talents(list)
-    embed_icon = get_character_icon(name)
+    embed_icon = asset_manifest.get_character_asset(record.url_name, "icon-big")
 
     embed = create_embed(
         name=" ",
         title=f"{char_name}: {CharacterSkills.PASSIVE_TALENTS.value}",
         # icon=embed_icon,
         text=passive_talents_list[0],
-        color=VISION_TO_COLOR[get_vision(name)],
+        color=VISION_TO_COLOR[record.vision],
         page=1,
         total_pages=1
     )
@@ -170,20 +251,18 @@ def create_passive_talent_embed(name: str):
     embed.set_thumbnail(url=embed_icon)
     return ([embed], False)
 
-def create_constellations_embed(name: str):
-    character = get_character(name)
-    char_name = character["name"]
-    list = get_char_cons_list(name)
+def create_constellations_embed(record: CharacterRecord):
+    char_name = record.name
+    list = record.constellations
     cons_list = format_constellations(list)
-    embed_icon = get_character_icon(name)
-    embed_image = get_character_constellation(name)
+    embed_image = asset_manifest.get_character_asset(record.url_name, "constellation")
 
     embed = create_embed(
         name=" ",
         title=f"{char_name}: {CharacterSkills.CONSTELLATIONS.value}",
         # icon=embed_icon,
         text=cons_list[0],
-        color=VISION_TO_COLOR[get_vision(name)],
+        color=VISION_TO_COLOR[record.vision],
         page=1,
         total_pages=1
     )
@@ -248,33 +327,63 @@ def format_talent_upgrades_list(list: list):
         upgrades.append(f"- {upgrade['name']}: {upgrade['value']}\n")
     return ''.join(upgrades)
 
-def get_talent(character: dict, type: str):
-    for talent in character["skillTalents"]:
-        if talent['unlock'] == type:
-            return talent
-        
-def get_talent_upgrades(character: dict, type: str):
+def get_talent_upgrades(record: CharacterRecord, type: str):
     upgrades_str = ""
     scalings = False
-    talent = get_talent(character, type)
-    if 'upgrades' in talent:
+    talent = record.get_talent(type)
+    if talent and 'upgrades' in talent:
         upgrades_list = talent['upgrades']
         scalings = True
         upgrades_str = format_talent_upgrades_list(upgrades_list)
     return (upgrades_str, scalings)
                 
 
+"""
+    Get the in-game day for a server region. The game day starts at the
+    region's daily reset (04:00 server time), not at midnight.
+
+    Parameters:
+    region: str - Server region (America, Europe, Asia).
+    now: datetime - Optional aware datetime, defaults to the current time.
+
+    Returns:
+    str - Weekday name, e.g. "Monday".
+"""
+def get_server_day(region: str, now: datetime.datetime = None):
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    offset = datetime.timedelta(hours=SERVER_REGIONS[region] - SERVER_RESET_HOUR)
+    return WEEKDAYS[(now.astimezone(datetime.timezone.utc) + offset).isoweekday()]
+
+"""
+    Get the next daily reset of a server region.
+
+    Parameters:
+    region: str - Server region (America, Europe, Asia).
+    now: datetime - Optional aware datetime, defaults to the current time.
+
+    Returns:
+    datetime - Next reset time (UTC).
+"""
+def get_next_server_reset(region: str, now: datetime.datetime = None):
+    now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(datetime.timezone.utc)
+    reset = now.replace(hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(hours=SERVER_RESET_HOUR - SERVER_REGIONS[region])
+    while reset <= now:
+        reset += datetime.timedelta(days=1)
+    return reset
+
 """
     Get the available talent books for the day and the characters that use the books.
 
+    Parameters:
+    region: str - Server region whose day is used.
+
     Returns:
     dict("book": str, dict("availability": list, "characters": list))
 """
-def get_daily_talent_books():
-    all_talent_books = get_talent_books()
+async def get_daily_talent_books(region: str = DEFAULT_SERVER_REGION):
+    all_talent_books = await get_talent_books()
     daily_books = {}
-    # Today's date (PST)
-    today = WEEKDAYS[datetime.datetime.now().weekday()]
+    today = get_server_day(region)
     for book in all_talent_books:
         if today in all_talent_books[book]['availability']:
             daily_books[book] = all_talent_books[book]['characters']
@@ -286,16 +395,8 @@ def get_daily_talent_books():
     Returns:
     dict("book": str, dict("availability": list, "characters": list))
 """
-def get_talent_books():
-    response = requests.get(endpoint + "/materials/talent-book")
-    result = {}
-    books = response.json()
-    for book in books:
-        result[book] = {
-            'availability': books[book]['availability'],
-            'characters': books[book]['characters']
-            }
-    return result
+async def get_talent_books():
+    return await jmp_snapshot.get_talent_books()
 
 """
     Return a list of embeds for the available talent books for the day.
@@ -303,8 +404,8 @@ def get_talent_books():
     Returns:
     list of Embeds
 """
-def get_daily_talent_books_embeds():
-    books = get_daily_talent_books()
+async def get_daily_talent_books_embeds(region: str = DEFAULT_SERVER_REGION):
+    books = await get_daily_talent_books(region)
     embeds = []
     for book in books:
         icon = get_guide_icon(book)
@@ -341,13 +442,11 @@ def get_daily_talent_books_embeds():
     name: str - Character name.
 
     Returns:
-    url - Character icon url1.
+    url - Character icon url.
 """
 def get_character_icon(name: str):
-    url_name = CHAR_TO_URL[name] if name in CHAR_TO_URL else name.lower().replace(" ", "-")
-    response = requests.get(endpoint + f"/characters/{url_name}/icon-big")
-    icon = response.url
-    return icon
+    url_name = get_char_url_name(name)
+    return asset_manifest.get_character_asset(url_name, "icon-big")
 
 """
     Get the character's constellation icon.
@@ -359,12 +458,8 @@ def get_character_icon(name: str):
     url - Character constellation icon url.
 """
 def get_character_constellation(name: str):
-    url_name = CHAR_TO_URL[name] if name in CHAR_TO_URL else name.lower().replace(" ", "-")
-    response = requests.get(endpoint + f"/characters/{url_name}/constellation")
-    if response.status_code != 200:
-        return get_character_icon(name)
-    icon = response.url
-    return icon
+    url_name = get_char_url_name(name)
+    return asset_manifest.get_character_asset(url_name, "constellation")
 
 """
     Get a character's vision.
@@ -375,8 +470,8 @@ def get_character_constellation(name: str):
     Returns:
     str - Character vision.
 """
-def get_vision(name: str):
-    character = get_character(name)
+async def get_vision(name: str):
+    character = await get_character(name)
     return character['vision']
 
 """
@@ -391,41 +486,27 @@ def get_vision(name: str):
 def get_guide_icon(name: str):
     # https://genshin.jmp.blue/materials/talent-book/guide-to-admonition
     url = endpoint + f"/materials/talent-book/guide-to-{name.lower()}"
-    response = requests.get(url)
-    icon = response.url
-    return icon
+    return asset_manifest.get_asset(asset_manifest.book_key(name), url)
 
 def get_talent_na_icon(name: str):
     # https://genshin.jmp.blue/characters/ganyu/talent-na
     url_name = get_char_url_name(name)
-    url = endpoint + f"/characters/{url_name}/talent-na"
-    response = requests.get(url)
-    if response.status_code != 200:
-        return get_character_icon(name)
-    icon = response.url
-    return icon
+    return asset_manifest.get_character_asset(url_name, "talent-na")
 
 def get_talent_skill_icon(name: str):
     # https://genshin.jmp.blue/characters/ganyu/talent-skill
     url_name = get_char_url_name(name)
-    url = endpoint + f"/characters/{url_name}/talent-skill"
-    response = requests.get(url)
-    if response.status_code != 200:
-        return get_character_icon(name)
-    icon = response.url
-    return icon
+    return asset_manifest.get_character_asset(url_name, "talent-skill")
 
 def get_talent_burst_icon(name: str):
     # https://genshin.jmp.blue/characters/ganyu/talent-burst
     url_name = get_char_url_name(name)
-    url = endpoint + f"/characters/{url_name}/talent-burst"
-    response = requests.get(url)
-    if response.status_code != 200:
-        return get_character_icon(name)
-    icon = response.url
-    return icon
+    return asset_manifest.get_character_asset(url_name, "talent-burst")
 
 def get_char_url_name(name: str):
+    url_name = character_search.resolve(name)
+    if url_name:
+        return url_name
     for key in CHAR_TO_URL:
         if name.lower() == key.lower():
             name = key
@@ -442,10 +523,7 @@ def get_char_url_name(name: str):
     url - Artifact icon url.
 """
 def get_artifact_icon(icon_name: str):
-    # to lowercase and replace all apostrophes with hyphens
-    url_name = icon_name.lower().replace("'", "-")
-    url = endpoint + f"/artifact/{url_name}/flower-of-life"
-    response = requests.get(url)
-    icon = response.url
-    return icon
-
+    # to lowercase, drop apostrophes and replace spaces with hyphens
+    url_name = icon_name.lower().replace("'", "").replace(" ", "-")
+    url = endpoint + f"/artifacts/{url_name}/flower-of-life"
+    return asset_manifest.get_asset(asset_manifest.artifact_key(url_name), url)
@@ -0,0 +1,169 @@
+import asyncio
+import datetime
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from utils import metrics
+from utils.cache import LRUCache
+from utils.constants import SERVER_REGIONS, SERVER_RESET_HOUR
+from utils.storage import DATA_DIR
+
+HOYOLAB_CACHE_FILE = os.getenv('HOYOLAB_CACHE_FILE', os.path.join(DATA_DIR, 'hoyolab_cache.sqlite3'))
+# Number of responses also kept in memory in front of SQLite
+HOYOLAB_MEMORY_CACHE_SIZE = int(os.getenv('HOYOLAB_MEMORY_CACHE_SIZE', 2000))
+# Seconds between purges of the expired responses from SQLite
+HOYOLAB_CACHE_PURGE_INTERVAL = float(os.getenv('HOYOLAB_CACHE_PURGE_INTERVAL', 10 * 60))
+
+"""
+    Seconds each HoyoLab endpoint's responses stay valid.
+    Spiral Abyss data is instead kept until the next abyss season starts.
+"""
+ENDPOINT_TTLS = {
+    "notes": int(os.getenv('HOYOLAB_NOTES_TTL', 30)),
+    "genshin_user": int(os.getenv('HOYOLAB_USER_TTL', 6 * 60 * 60)),
+    "nickname": int(os.getenv('HOYOLAB_NICKNAME_TTL', 6 * 60 * 60)),
+}
+
+_memory = metrics.register_cache("hoyolab_responses", LRUCache(maxsize=HOYOLAB_MEMORY_CACHE_SIZE))
+_db = None
+_db_lock = threading.Lock()
+_last_purge = 0.0
+
+def _get_db():
+    global _db
+    if _db is None:
+        os.makedirs(os.path.dirname(HOYOLAB_CACHE_FILE) or '.', exist_ok=True)
+        _db = sqlite3.connect(HOYOLAB_CACHE_FILE, check_same_thread=False)
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "endpoint TEXT, key TEXT, expires_at REAL, payload BLOB, "
+            "PRIMARY KEY (endpoint, key))")
+        _db.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+        _db.commit()
+    return _db
+
+def _db_get(endpoint: str, key: str):
+    with _db_lock:
+        row = _get_db().execute(
+            "SELECT expires_at, payload FROM responses WHERE endpoint = ? AND key = ?",
+            (endpoint, key)).fetchone()
+    if row is None or row[0] <= time.time():
+        return None
+    try:
+        return row[0], pickle.loads(row[1])
+    except Exception as e:
+        # e.g. pickled by an older genshin.py whose models changed: drop it and refetch
+        print(f"Dropped unreadable HoyoLab {endpoint} response: {e}")
+        with _db_lock:
+            db = _get_db()
+            db.execute("DELETE FROM responses WHERE endpoint = ? AND key = ?", (endpoint, key))
+            db.commit()
+        return None
+
+def _db_set(endpoint: str, key: str, expires_at: float, value):
+    global _last_purge
+    with _db_lock:
+        db = _get_db()
+        db.execute(
+            "INSERT OR REPLACE INTO responses (endpoint, key, expires_at, payload) VALUES (?, ?, ?, ?)",
+            (endpoint, key, expires_at, pickle.dumps(value)))
+        now = time.time()
+        if now - _last_purge >= HOYOLAB_CACHE_PURGE_INTERVAL:
+            db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            _last_purge = now
+        db.commit()
+
+"""
+    Build the cache key of a response fetched with one HoyoLab account's cookies.
+    What HoyoLab returns depends on whose cookies made the call (real-time notes
+    are only returned to their owner, private records only to theirs), so
+    responses are never shared between accounts.
+
+    Parameters:
+    account_id: int - HoyoLab account id (ltuid_v2) of the cookies used.
+    uid: int - Genshin player UID.
+"""
+def account_key(account_id, uid):
+    return f"{account_id}/{uid}"
+
+"""
+    Get the server region of a Genshin UID from its first digit.
+"""
+def get_uid_region(uid: int):
+    first_digit = str(uid)[0]
+    if first_digit == "6":
+        return "America"
+    if first_digit == "7":
+        return "Europe"
+    return "Asia"
+
+"""
+    Get the start of the next Spiral Abyss season (1st and 16th of the month at
+    the server's daily reset).
+
+    Parameters:
+    uid: int - Genshin player UID, used for its server region.
+
+    Returns:
+    datetime - Next rollover (UTC).
+"""
+def next_abyss_rollover(uid: int, now: datetime.datetime = None):
+    now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(datetime.timezone.utc)
+    offset = datetime.timedelta(hours=SERVER_RESET_HOUR - SERVER_REGIONS[get_uid_region(uid)])
+    year, month = now.year, now.month
+    for _ in range(3):
+        for day in (1, 16):
+            rollover = datetime.datetime(year, month, day, tzinfo=datetime.timezone.utc) + offset
+            if rollover > now:
+                return rollover
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+"""
+    Return a cached HoyoLab response, or fetch and cache it.
+
+    Responses are kept in memory and in a local SQLite database so they
+    survive restarts.
+
+    Parameters:
+    endpoint: str - Endpoint name (key of ENDPOINT_TTLS).
+    key: str - Cache key within the endpoint (see account_key).
+    fetch: function - Coroutine function fetching the response.
+    expires_at: datetime - Optional absolute expiry overriding the endpoint TTL.
+
+    Returns:
+    The cached or fetched response.
+"""
+async def cached(endpoint: str, key, fetch, expires_at: datetime.datetime = None):
+    key = str(key)
+    entry = _memory.get((endpoint, key))
+    if entry is None:
+        entry = await asyncio.to_thread(_db_get, endpoint, key)
+    if entry is not None and entry[0] > time.time():
+        _memory.set((endpoint, key), entry)
+        return entry[1]
+
+    value = await fetch()
+    if expires_at is not None:
+        expiry = expires_at.timestamp()
+    else:
+        expiry = time.time() + ENDPOINT_TTLS[endpoint]
+    _memory.set((endpoint, key), (expiry, value))
+    try:
+        await asyncio.to_thread(_db_set, endpoint, key, expiry, value)
+    except (sqlite3.Error, pickle.PicklingError, TypeError) as e:
+        print(f"Could not persist HoyoLab {endpoint} response: {e}")
+    return value
+
+"""
+    Drop a cached response, e.g. after the data is known to have changed.
+"""
+def invalidate(endpoint: str, key):
+    key = str(key)
+    _memory.pop((endpoint, key))
+    with _db_lock:
+        db = _get_db()
+        db.execute("DELETE FROM responses WHERE endpoint = ? AND key = ?", (endpoint, key))
+        db.commit()
@@ -0,0 +1,236 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+
+from utils import http_client
+from utils.storage import load_json, save_json
+
+# Base url of the genshin.jmp.blue API (overridable, e.g. to point at the benchmark stub server)
+endpoint = os.getenv('JMP_BLUE_URL', "https://genshin.jmp.blue")
+
+SNAPSHOT_FILE = "jmp_snapshot.json"
+# Seconds between background refreshes of the snapshot
+REFRESH_INTERVAL = int(os.getenv('JMP_REFRESH_INTERVAL', 6 * 60 * 60))
+
+"""
+    Local, versioned copy of the genshin.jmp.blue static data.
+
+    {
+        "version": str - hash of every document in the snapshot,
+        "updated_at": str - ISO timestamp of the last successful refresh,
+        "characters": dict(url name: character document),
+        "talent_books": dict(book: dict("availability": list, "characters": list)),
+        "etags": dict(path: str),
+        "hashes": dict(path: str),
+    }
+"""
+snapshot = {}
+_refresh_task = None
+# Coroutine functions called with the new version whenever the data version changes
+_version_listeners = []
+
+def _empty_snapshot():
+    return {
+        "version": None,
+        "updated_at": None,
+        "characters": {},
+        "talent_books": {},
+        "etags": {},
+        "hashes": {},
+    }
+
+def _hash(document):
+    return hashlib.sha1(json.dumps(document, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _compute_version(hashes: dict):
+    combined = ''.join(f"{path}:{hashes[path]}" for path in sorted(hashes))
+    return hashlib.sha1(combined.encode('utf-8')).hexdigest()[:12]
+
+"""
+    Load the snapshot saved on disk into memory.
+
+    Returns:
+    dict - The loaded snapshot.
+"""
+def load_snapshot():
+    global snapshot
+    loaded = load_json(SNAPSHOT_FILE)
+    snapshot = {**_empty_snapshot(), **loaded} if loaded else _empty_snapshot()
+    return snapshot
+
+"""
+    Register a coroutine function to be awaited with the new data version
+    every time a refresh changes the snapshot.
+"""
+def on_version_change(listener):
+    _version_listeners.append(listener)
+    return listener
+
+def get_version():
+    return snapshot.get("version")
+
+def get_all_characters():
+    return snapshot.get("characters", {})
+
+"""
+    Get a character document from the snapshot.
+
+    If the character is not in the snapshot yet (new release or empty snapshot),
+    it is fetched once from genshin.jmp.blue and added to the snapshot.
+
+    Parameters:
+    url_name: str - url-friendly character name.
+
+    Returns:
+    dict - Character document, or None if the character does not exist.
+"""
+async def get_character(url_name: str):
+    characters = snapshot.get("characters", {})
+    if url_name in characters:
+        return characters[url_name]
+    response = await http_client.get(endpoint + f"/characters/{url_name}")
+    if response.status != 200:
+        return None
+    character = response.json()
+    characters[url_name] = character
+    return character
+
+"""
+    Get every talent book and the characters that use it from the snapshot.
+
+    Returns:
+    dict("book": str, dict("availability": list, "characters": list))
+"""
+async def get_talent_books():
+    books = snapshot.get("talent_books")
+    if not books:
+        books = (await _fetch_talent_books(_empty_snapshot()))[0]
+        snapshot["talent_books"] = books
+    return books
+
+async def _conditional_get(path: str, previous: dict):
+    headers = {}
+    etag = previous["etags"].get(path)
+    if etag:
+        headers["If-None-Match"] = etag
+    response = await http_client.get(endpoint + path, headers=headers)
+    return response
+
+async def _fetch_talent_books(previous: dict):
+    path = "/materials/talent-book"
+    response = await _conditional_get(path, previous)
+    if response.status == 304:
+        return previous["talent_books"], response.headers.get("ETag", previous["etags"].get(path))
+    if not response.ok:
+        raise Exception(f"Failed to fetch talent books ({response.status}).")
+    books = response.json()
+    result = {}
+    for book in books:
+        result[book] = {
+            'availability': books[book]['availability'],
+            'characters': books[book]['characters']
+            }
+    return result, response.headers.get("ETag")
+
+"""
+    Refresh the snapshot from genshin.jmp.blue.
+
+    Only characters that are new, or whose document changed upstream, are
+    downloaded again. Unchanged documents are detected with ETags when the
+    server sends them, and by content hash otherwise.
+
+    Returns:
+    tuple - (bool, list)
+        bool - True if the data version changed.
+        list - url names of the characters that were added or updated.
+"""
+async def refresh_snapshot():
+    global snapshot
+    previous = snapshot if snapshot else _empty_snapshot()
+    updated = {
+        **_empty_snapshot(),
+        "characters": dict(previous["characters"]),
+        "etags": dict(previous["etags"]),
+        "hashes": dict(previous["hashes"]),
+    }
+    changed = []
+
+    response = await http_client.get(endpoint + "/characters")
+    if not response.ok:
+        raise Exception(f"Failed to fetch characters ({response.status}).")
+    character_names = response.json()
+
+    for url_name in character_names:
+        path = f"/characters/{url_name}"
+        if url_name in previous["characters"]:
+            response = await _conditional_get(path, previous)
+            if response.status == 304:
+                continue
+        else:
+            response = await http_client.get(endpoint + path)
+        if response.status != 200:
+            continue
+        character = response.json()
+        document_hash = _hash(character)
+        if updated["hashes"].get(path) != document_hash:
+            changed.append(url_name)
+        updated["characters"][url_name] = character
+        updated["hashes"][path] = document_hash
+        if response.headers.get("ETag"):
+            updated["etags"][path] = response.headers["ETag"]
+
+    # drop characters that were removed upstream
+    for url_name in set(updated["characters"]) - set(character_names):
+        del updated["characters"][url_name]
+        updated["hashes"].pop(f"/characters/{url_name}", None)
+        updated["etags"].pop(f"/characters/{url_name}", None)
+
+    books, books_etag = await _fetch_talent_books(previous)
+    updated["talent_books"] = books
+    updated["hashes"]["/materials/talent-book"] = _hash(books)
+    if books_etag:
+        updated["etags"]["/materials/talent-book"] = books_etag
+
+    updated["version"] = _compute_version(updated["hashes"])
+    updated["updated_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    version_changed = updated["version"] != previous.get("version")
+
+    snapshot = updated
+    save_json(SNAPSHOT_FILE, snapshot)
+    return version_changed, changed
+
+"""
+    Refresh the snapshot and, if the data version changed, await every version listener.
+
+    Returns:
+    tuple - See refresh_snapshot.
+"""
+async def refresh():
+    version_changed, changed = await refresh_snapshot()
+    if version_changed:
+        print(f"jmp.blue snapshot updated to version {get_version()} ({len(changed)} characters changed)")
+        for listener in _version_listeners:
+            await listener(get_version())
+    return version_changed, changed
+
+async def _refresh_loop():
+    while True:
+        try:
+            await refresh()
+        except Exception as e:
+            # Keep serving the previous snapshot if jmp.blue is down
+            print(f"jmp.blue snapshot refresh failed: {e}")
+        await asyncio.sleep(REFRESH_INTERVAL)
+
+"""
+    Start the background refresh of the snapshot. Safe to call more than once.
+"""
+def start_refresh():
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.get_event_loop().create_task(_refresh_loop())
+    return _refresh_task
+
+load_snapshot()
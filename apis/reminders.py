@@ -0,0 +1,183 @@
+import asyncio
+import datetime
+import heapq
+import os
+import random
+
+from apis.genshin_api import fetch_notes, get_genshin_api_client
+from utils.mongo_db import delete_reminder, get_reminders, get_user_fields, set_reminder
+
+# Random delay (seconds) added to every scheduled check, so checks do not line up
+REMINDER_JITTER = int(os.getenv('REMINDER_JITTER', 120))
+# Seconds before re-checking a user whose resin and realm currency are both already full
+REMINDER_FULL_RECHECK = int(os.getenv('REMINDER_FULL_RECHECK', 6 * 60 * 60))
+# Seconds before retrying a user whose notes could not be fetched
+REMINDER_RETRY = int(os.getenv('REMINDER_RETRY', 30 * 60))
+# Overdue checks found at startup are spread over this many seconds
+REMINDER_STARTUP_SPREAD = int(os.getenv('REMINDER_STARTUP_SPREAD', 10 * 60))
+# Checks running at the same time, and seconds before a check is given up (and retried later)
+REMINDER_CONCURRENCY = int(os.getenv('REMINDER_CONCURRENCY', 20))
+REMINDER_CHECK_TIMEOUT = float(os.getenv('REMINDER_CHECK_TIMEOUT', 60))
+
+"""
+    Opt-in DM reminders for full resin and realm currency.
+
+    Instead of polling, every subscriber has a single next check, scheduled at
+    the time their resin or realm currency is predicted to be full (from the
+    recovery times in their notes). Checks are kept in a heap ordered by time,
+    and the schedule is persisted in Mongo so restarts resume where they left off.
+    Due checks run as separate tasks (at most REMINDER_CONCURRENCY at once), so a
+    slow HoyoLab call only delays its own user.
+"""
+# heap of (next check timestamp, discord_id)
+_heap = []
+# discord_id -> timestamp of the scheduled check; heap entries that do not match are stale
+_scheduled = {}
+# discord_id -> dict("resin": bool, "realm": bool), whether the user was already notified
+_notified = {}
+_wakeup = asyncio.Event()
+_check_slots = asyncio.Semaphore(REMINDER_CONCURRENCY)
+# running checks, referenced so they are not garbage collected
+_checks = set()
+_task = None
+_notify = None
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+def _schedule(discord_id: str, timestamp: float):
+    _scheduled[discord_id] = timestamp
+    heapq.heappush(_heap, (timestamp, discord_id))
+    _wakeup.set()
+
+async def _save(discord_id: str, timestamp: float):
+    await set_reminder(discord_id, {
+        "next_check": datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc),
+        "notified": _notified.get(discord_id, {"resin": False, "realm": False}),
+    })
+
+"""
+    Subscribe a user to resin/realm currency reminders.
+
+    Parameters:
+    discord_id: int - Discord user id.
+
+    Returns:
+    str - Message for the user.
+"""
+async def enable_reminders(discord_id: int):
+    discord_id = str(discord_id)
+    user = await get_user_fields(discord_id, ["uid", "authentication_tokens"])
+    if not user or not user.get("uid") or not user.get("authentication_tokens"):
+        return "Please link your HoyoLab account with /authenticate before enabling reminders."
+    _notified[discord_id] = {"resin": False, "realm": False}
+    timestamp = _now()
+    await _save(discord_id, timestamp)
+    _schedule(discord_id, timestamp)
+    return "Reminders enabled. I will DM you when your resin or realm currency is full."
+
+async def disable_reminders(discord_id: int):
+    discord_id = str(discord_id)
+    _scheduled.pop(discord_id, None)
+    _notified.pop(discord_id, None)
+    await delete_reminder(discord_id)
+
+"""
+    Check one user's notes, send the reminders that are due, and return when
+    the next check should happen.
+"""
+async def _check(discord_id: str):
+    user = await get_user_fields(discord_id, ["uid", "authentication_tokens"]) or {}
+    client = await get_genshin_api_client(discord_id, user.get("authentication_tokens"))
+    notes = await fetch_notes(client, user.get("uid"))
+    notified = _notified.setdefault(discord_id, {"resin": False, "realm": False})
+    messages = []
+
+    resin_full = notes.current_resin >= notes.max_resin
+    if resin_full and not notified["resin"]:
+        messages.append(f"Your resin is full ({notes.current_resin}/{notes.max_resin}).")
+    notified["resin"] = resin_full
+
+    realm_full = notes.current_realm_currency >= notes.max_realm_currency
+    if realm_full and not notified["realm"] and notes.max_realm_currency > 0:
+        messages.append(f"Your realm currency is full ({notes.current_realm_currency}/{notes.max_realm_currency}).")
+    notified["realm"] = realm_full
+
+    if messages and _notify:
+        await _notify(discord_id, "\n".join(messages))
+
+    # Next check at the earliest predicted "full" time that has not been notified yet
+    predictions = []
+    if not resin_full:
+        predictions.append(notes.remaining_resin_recovery_time.total_seconds())
+    if not realm_full and notes.max_realm_currency > 0:
+        predictions.append(notes.remaining_realm_currency_recovery_time.total_seconds())
+    delay = min(predictions) if predictions else REMINDER_FULL_RECHECK
+    return _now() + delay + random.uniform(0, REMINDER_JITTER)
+
+async def _run():
+    while True:
+        _wakeup.clear()
+        if not _heap:
+            await _wakeup.wait()
+            continue
+        timestamp, discord_id = _heap[0]
+        if _scheduled.get(discord_id) != timestamp:
+            # cancelled or rescheduled
+            heapq.heappop(_heap)
+            continue
+        delay = timestamp - _now()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        heapq.heappop(_heap)
+        # Wait for a free slot here rather than in the task, so a backlog of due
+        # checks does not pile up as tasks
+        await _check_slots.acquire()
+        task = asyncio.ensure_future(_run_check(discord_id, timestamp))
+        _checks.add(task)
+        task.add_done_callback(_checks.discard)
+
+async def _run_check(discord_id: str, timestamp: float):
+    try:
+        try:
+            next_check = await asyncio.wait_for(_check(discord_id), timeout=REMINDER_CHECK_TIMEOUT)
+        except Exception as e:
+            print(f"Reminder check failed for {discord_id}: {e!r}")
+            next_check = _now() + REMINDER_RETRY + random.uniform(0, REMINDER_JITTER)
+    finally:
+        _check_slots.release()
+    # Unless the user unsubscribed, or subscribed again, while the check was running
+    if _scheduled.get(discord_id) == timestamp:
+        _schedule(discord_id, next_check)
+        try:
+            await _save(discord_id, next_check)
+        except Exception as e:
+            print(f"Could not save reminder for {discord_id}: {e}")
+
+"""
+    Load the saved reminders and start the scheduler. Safe to call more than once.
+
+    Parameters:
+    notify: function - Coroutine function called with (discord_id, message) to DM a user.
+"""
+async def start_reminders(notify):
+    global _task, _notify
+    _notify = notify
+    if _task is not None and not _task.done():
+        return _task
+    now = _now()
+    for reminder in await get_reminders():
+        discord_id = reminder["discord_id"]
+        _notified[discord_id] = reminder.get("notified", {"resin": False, "realm": False})
+        next_check = reminder.get("next_check")
+        timestamp = next_check.replace(tzinfo=datetime.timezone.utc).timestamp() if next_check else now
+        if timestamp <= now:
+            # spread overdue checks instead of running them all at once
+            timestamp = now + random.uniform(0, REMINDER_STARTUP_SPREAD)
+        _schedule(discord_id, timestamp)
+    _task = asyncio.get_event_loop().create_task(_run())
+    return _task
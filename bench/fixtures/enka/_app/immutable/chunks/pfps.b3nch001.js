@@ -0,0 +1 @@
+const n={"1":{"id":1}},t={"1":{"iconPath":"UI_AvatarIcon_PlayerGirl"},"10000052":{"iconPath":"UI_AvatarIcon_Shougun"},"10000037":{"iconPath":"UI_AvatarIcon_Ganyu"},"10000023":{"iconPath":"UI_AvatarIcon_Xiangling"},"10000032":{"iconPath":"UI_AvatarIcon_Bennett"}};export{t as G,n as H};
@@ -0,0 +1,60 @@
+"""
+    Re-record the benchmark fixtures from the live upstreams.
+
+    Every JSON fixture under bench/fixtures/jmp, ambr and enka-loc is fetched
+    again from the upstream it replays and overwritten, so the benchmark keeps
+    measuring realistic payloads as the upstream data grows. Add a file (any
+    content) under the matching path to record a new response.
+
+    Not re-recorded:
+        enka - the profile fixtures are stored as enkapy parses them, and the
+               pfps bundle name changes with every enka.network deploy.
+        hoyolab - responses require a logged in account's cookies.
+
+    Usage (from the repository root):
+        python -m bench.record
+"""
+import json
+import os
+import sys
+import urllib.request
+
+from bench.stub_server import FIXTURES_DIR
+
+UPSTREAMS = {
+    "jmp": "https://genshin.jmp.blue",
+    "ambr": "https://api.ambr.top",
+    "enka-loc": "https://raw.githubusercontent.com/EnkaNetwork/API-docs/master/store",
+}
+
+def record(upstream: str, base_url: str):
+    recorded = 0
+    upstream_dir = os.path.join(FIXTURES_DIR, upstream)
+    for directory, _, files in os.walk(upstream_dir):
+        for file in sorted(files):
+            if not file.endswith('.json'):
+                continue
+            fixture = os.path.join(directory, file)
+            path = os.path.relpath(fixture, upstream_dir)[:-len('.json')].replace(os.sep, '/')
+            url = f"{base_url}/{path}"
+            if upstream == "enka-loc":
+                url += ".json"
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    data = json.loads(response.read())
+            except Exception as e:
+                print(f"Skipped {url}: {e}")
+                continue
+            with open(fixture, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.write('\n')
+            recorded += 1
+    return recorded
+
+def main():
+    for upstream, base_url in UPSTREAMS.items():
+        print(f"{upstream}: {record(upstream, base_url)} fixtures recorded")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
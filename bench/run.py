@@ -0,0 +1,263 @@
+"""
+    Offline benchmark of the handlers behind /skills, /books, /summary, /showcase and /notes.
+
+    Every upstream (genshin.jmp.blue, enka.network, ambr.top, HoyoLab) is
+    replayed from bench/fixtures by a local stub server with configurable
+    latency and error rate, and Mongo is replaced by an in-process mongomock
+    client, so no network access or credentials are needed.
+
+    Each command runs in two modes:
+        cold - the per-request caches (rendered embeds, profiles, HoyoLab
+               responses, user records) are dropped before every batch. The
+               jmp.blue snapshot and asset indexes stay loaded, as they are
+               once the bot is ready.
+        warm - every input is run once before measuring, so caches are populated.
+
+    For every command and mode it reports p50/p95/p99 latency, outbound
+    requests per call and the peak Python memory allocated while running.
+
+    Usage (from the repository root):
+        python -m bench.run
+        python -m bench.run --commands skills,notes --iterations 200 --concurrency 10
+        python -m bench.run --latency 0.08 --jitter 0.04 --upstream-latency enka=0.4 --error-rate 0.02
+        python -m bench.run --json bench_results.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from bench.stub_server import StubServer
+
+USERS = [
+    {"discord_id": "100000000000000001", "uid": 600000001},
+    {"discord_id": "100000000000000002", "uid": 700000002},
+]
+# HoyoLab account id (ltuid_v2) of the users' cookies
+LTUID = 1
+SKILL_INPUTS = ["Raiden", "ganyu", "Xiangling", "bennet"]
+
+def percentile(values: list, p: float):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def _configure_environment(server: StubServer, data_dir: str):
+    # Read by the bot's modules at import time, so this must run before importing them
+    os.environ['MONGODB_URI'] = 'mongomock://bench'
+    os.environ['DATA_DIR'] = data_dir
+    os.environ['JMP_BLUE_URL'] = server.url('jmp')
+    os.environ['ENKA_URL'] = server.url('enka')
+    os.environ['AMBR_URL'] = server.url('ambr')
+    os.environ['ENKA_LOC_URL'] = server.url('enka-loc') + '/loc.json'
+
+"""
+    One benchmarked command: the handler behind a slash command, the inputs it
+    is called with (cycled), and how to drop its caches for cold runs.
+"""
+class Command:
+    def __init__(self, name: str, inputs: list, call, reset):
+        self.name = name
+        self.inputs = inputs
+        self.call = call
+        self.reset = reset
+
+def _build_commands():
+    from apis import books_schedule, enka_api, genshin_api, genshin_dev, hoyolab_cache
+    from utils import mongo_db
+    from utils.constants import SERVER_REGIONS, CharacterSkills
+
+    def reset_users():
+        mongo_db.user_cache.clear()
+
+    def reset_skills():
+        genshin_dev.skills_cache.clear()
+
+    def reset_books():
+        books_schedule.daily_books.clear()
+
+    def reset_profiles():
+        enka_api.profile_cache.clear()
+        reset_users()
+
+    def reset_notes():
+        for user in USERS:
+            for endpoint in ("notes", "genshin_user", "nickname"):
+                hoyolab_cache.invalidate(endpoint, hoyolab_cache.account_key(LTUID, user["uid"]))
+        reset_users()
+
+    skill_inputs = [(name, skill.value) for name in SKILL_INPUTS for skill in CharacterSkills]
+    discord_ids = [int(user["discord_id"]) for user in USERS]
+    return [
+        Command("skills", skill_inputs, lambda args: genshin_dev.embed_char_skill_info(*args), reset_skills),
+        Command("books", list(SERVER_REGIONS), books_schedule.get_books_embeds, reset_books),
+        Command("summary", discord_ids, lambda discord_id: enka_api.get_enka_user_summary(discord_id, None), reset_profiles),
+        Command("showcase", discord_ids, lambda discord_id: enka_api.get_user_showcase(None, discord_id), reset_profiles),
+        Command("notes", discord_ids, genshin_api.get_notes_embed, reset_notes),
+    ]
+
+"""
+    Point the bot at the stub server and run its startup work (users, snapshot,
+    asset indexes, Enka language tables), as on_ready does.
+"""
+async def setup(server: StubServer):
+    from apis import enka_api, enka_assets, genshin_api, jmp_snapshot
+    from bench.stubs import StubEnka, StubGenshinClient
+    from utils import mongo_db
+
+    enka_api.set_client(StubEnka(server.url('enka'), os.environ['ENKA_LOC_URL']))
+    genshin_api.set_client_factory(lambda cookies: StubGenshinClient(server.url('hoyolab'), cookies))
+
+    await mongo_db.ensure_indexes()
+    for user in USERS:
+        await mongo_db.add_to_users({
+            "discord_id": user["discord_id"],
+            "uid": user["uid"],
+            "authentication_tokens": {"ltuid_v2": LTUID, "ltoken_v2": "bench"},
+        })
+    await jmp_snapshot.refresh()
+    await enka_assets.refresh_avatar_index()
+    await enka_assets.refresh_namecard_index()
+    await enka_api.load_enka_lang()
+
+async def _timed(call):
+    start = time.perf_counter()
+    try:
+        await call
+        return time.perf_counter() - start, None
+    except Exception as e:
+        return time.perf_counter() - start, type(e).__name__
+
+async def measure(command: Command, mode: str, iterations: int, concurrency: int, server: StubServer, trace_memory: bool):
+    if mode == "warm":
+        for args in command.inputs:
+            await _timed(command.call(args))
+
+    requests_before, _ = server.counts()
+    if trace_memory:
+        gc.collect()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    latencies = []
+    errors = Counter()
+    for start in range(0, iterations, concurrency):
+        if mode == "cold":
+            command.reset()
+        batch = range(start, min(start + concurrency, iterations))
+        results = await asyncio.gather(*[_timed(command.call(command.inputs[i % len(command.inputs)])) for i in batch])
+        for elapsed, error in results:
+            if error:
+                errors[error] += 1
+            else:
+                latencies.append(elapsed)
+
+    peak = tracemalloc.get_traced_memory()[1] - baseline if trace_memory else None
+    requests_after, _ = server.counts()
+    requests = requests_after - requests_before
+    return {
+        "command": command.name,
+        "mode": mode,
+        "calls": iterations,
+        "errors": dict(errors),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "requests_per_call": sum(requests.values()) / iterations,
+        "requests_by_upstream": dict(requests),
+        "peak_memory_kib": peak / 1024 if peak is not None else None,
+    }
+
+def print_results(results: list):
+    header = f"{'command':<10} {'mode':<5} {'calls':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/call':>9} {'peak KiB':>10}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        peak = f"{result['peak_memory_kib']:.1f}" if result['peak_memory_kib'] is not None else "-"
+        print(
+            f"{result['command']:<10} {result['mode']:<5} {result['calls']:>6} {sum(result['errors'].values()):>6} "
+            f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+            f"{result['requests_per_call']:>9.2f} {peak:>10}")
+
+async def run(args, server: StubServer):
+    from apis import genshin_api
+    from utils import http_client
+
+    try:
+        await setup(server)
+        startup_requests, _ = server.counts()
+        print(f"Startup: {sum(startup_requests.values())} outbound requests {dict(startup_requests)}\n")
+
+        commands = {command.name: command for command in _build_commands()}
+        modes = ["cold", "warm"] if args.mode == "both" else [args.mode]
+        if not args.no_memory:
+            tracemalloc.start()
+        results = []
+        for name in args.commands:
+            for mode in modes:
+                results.append(await measure(commands[name], mode, args.iterations, args.concurrency, server, not args.no_memory))
+        return results
+    finally:
+        await http_client.close()
+        await genshin_api.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the bot's command handlers.")
+    parser.add_argument('--commands', default="skills,books,summary,showcase,notes",
+                        type=lambda value: [name.strip() for name in value.split(',') if name.strip()],
+                        help="Comma separated commands to run.")
+    parser.add_argument('--mode', choices=["cold", "warm", "both"], default="both")
+    parser.add_argument('--iterations', type=int, default=100, help="Calls per command and mode.")
+    parser.add_argument('--concurrency', type=int, default=1, help="Calls running at the same time.")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds added to every upstream response.")
+    parser.add_argument('--jitter', type=float, default=0.02, help="Up to this many extra seconds per response.")
+    parser.add_argument('--upstream-latency', action='append', default=[], metavar="UPSTREAM=SECONDS",
+                        help="Latency for one upstream (jmp, enka, enka-loc, ambr, hoyolab). Repeatable.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of upstream requests answered with a 503.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="Do not trace memory (tracing slows every call down).")
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+    unknown = set(args.commands) - {"skills", "books", "summary", "showcase", "notes"}
+    if unknown:
+        parser.error(f"unknown commands: {', '.join(sorted(unknown))}")
+    upstream_latency = {}
+    for item in args.upstream_latency:
+        upstream, _, seconds = item.partition('=')
+        upstream_latency[upstream] = float(seconds)
+    args.upstream_latency = upstream_latency
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = StubServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        upstream_latency=args.upstream_latency,
+        seed=args.seed,
+    )
+    server.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix='kuki-bench-') as data_dir:
+            _configure_environment(server, data_dir)
+            results = asyncio.run(run(args, server))
+    finally:
+        server.stop()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
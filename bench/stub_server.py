@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import socket
+import urllib.request
+from collections import Counter
+
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Last path segments served as images without a fixture file (jmp.blue icons, talent books, artifacts)
+IMAGE_ASSETS = {"icon", "icon-big", "constellation", "talent-na", "talent-skill", "talent-burst", "flower-of-life"}
+# Tiny valid PNG returned for every image
+PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+CONTENT_TYPES = {
+    ".json": "application/json",
+    ".js": "application/javascript",
+    ".html": "text/html",
+}
+
+# Path of the (uncounted) endpoint reporting the request counters
+STATS_PATH = "/_stats"
+
+def _find_fixture(path: str):
+    path = os.path.normpath(path.strip('/'))
+    if path.startswith('..'):
+        return None
+    base = os.path.join(FIXTURES_DIR, path)
+    for candidate in (base + '.json', base, os.path.join(base, 'index.html')):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+def _is_image(path: str):
+    last_segment = path.rstrip('/').rsplit('/', 1)[-1]
+    return last_segment in IMAGE_ASSETS or last_segment.startswith('guide-to-') or last_segment.endswith('.png')
+
+class _FixtureApp:
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self.requests = Counter()
+        self.errors = Counter()
+        self.random = random.Random(settings["seed"])
+
+    async def stats(self, request: web.Request):
+        return web.json_response({"requests": self.requests, "errors": self.errors})
+
+    async def handle(self, request: web.Request):
+        upstream = request.path.strip('/').split('/', 1)[0]
+        self.requests[upstream] += 1
+        latency = self.settings["upstream_latency"].get(upstream, self.settings["latency"])
+        delay = latency + self.random.uniform(0, self.settings["jitter"])
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.random.random() < self.settings["error_rate"]:
+            self.errors[upstream] += 1
+            return web.Response(status=503, text="Injected error")
+
+        if _is_image(request.path):
+            return web.Response(body=PNG, content_type="image/png")
+        fixture = _find_fixture(request.path)
+        if fixture is None:
+            return web.Response(status=404, text="No fixture")
+        with open(fixture, 'rb') as f:
+            body = f.read()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        content_type = CONTENT_TYPES.get(os.path.splitext(fixture)[1], "application/octet-stream")
+        return web.Response(body=body, content_type=content_type, headers={"ETag": etag})
+
+async def _serve_forever(settings: dict, conn):
+    fixtures = _FixtureApp(settings)
+    app = web.Application()
+    app.router.add_get(STATS_PATH, fixtures.stats)
+    app.router.add_route('*', '/{tail:.*}', fixtures.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    await web.SockSite(runner, sock).start()
+    conn.send(sock.getsockname()[1])
+    conn.close()
+    await asyncio.Event().wait()
+
+def _serve(settings: dict, conn):
+    asyncio.run(_serve_forever(settings, conn))
+
+"""
+    Local HTTP server replaying recorded upstream responses from bench/fixtures.
+
+    Every upstream is mounted under its own path prefix (/jmp, /enka, /enka-loc,
+    /ambr, /hoyolab), so pointing a module's base url at
+    http://127.0.0.1:<port>/<upstream> is enough to take it offline. A request
+    for /<upstream>/a/b is answered with fixtures/<upstream>/a/b.json, a/b or
+    a/b/index.html (query strings are ignored). Responses carry an ETag and
+    honour If-None-Match.
+
+    The server runs in a child process, so serving fixtures takes neither CPU
+    time nor traced memory from the code being measured.
+
+    Parameters:
+    latency: float - Seconds added to every response.
+    jitter: float - Up to this many extra seconds, drawn uniformly per response.
+    error_rate: float - Fraction of requests answered with a 503.
+    upstream_latency: dict(upstream: float) - Latency overriding `latency` per upstream.
+    seed: int - Seed for jitter and injected errors, so runs are repeatable.
+"""
+class StubServer:
+    def __init__(
+            self,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            error_rate: float = 0.0,
+            upstream_latency: dict = None,
+            seed: int = 0,
+            ):
+        self.settings = {
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "upstream_latency": upstream_latency or {},
+            "seed": seed,
+        }
+        self.port = None
+        self._process = None
+
+    def url(self, upstream: str):
+        return f"http://127.0.0.1:{self.port}/{upstream}"
+
+    """
+        Start serving on a free local port.
+
+        Returns:
+        int - The port.
+    """
+    def start(self):
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=_serve, args=(self.settings, child_conn), name='stub-server', daemon=True)
+        self._process.start()
+        if not parent_conn.poll(10):
+            self.stop()
+            raise RuntimeError("Stub server did not start.")
+        self.port = parent_conn.recv()
+        return self.port
+
+    """
+        Get the number of requests received, and answered with an injected
+        error, by upstream. Blocking: call it outside measured sections.
+
+        Returns:
+        tuple - (Counter, Counter)
+    """
+    def counts(self):
+        with urllib.request.urlopen(f"http://127.0.0.1:{self.port}{STATS_PATH}", timeout=10) as response:
+            stats = json.loads(response.read())
+        return Counter(stats["requests"]), Counter(stats["errors"])
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(timeout=10)
+            self._process = None
@@ -0,0 +1,96 @@
+import datetime
+from types import SimpleNamespace
+
+from utils import http_client
+
+"""
+    Stand-ins for the third-party clients that do their own HTTP (enkapy's Enka
+    and genshin.py's Client). They fetch the recorded responses from the stub
+    server through the bot's shared http_client, so latency, injected errors and
+    request counts apply to them like to every other upstream, and return
+    objects with the attributes the bot reads.
+"""
+
+def _to_namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+async def _get_json(url: str):
+    response = await http_client.get(url)
+    if not response.ok:
+        raise Exception(f"{url} returned {response.status}.")
+    return response.json()
+
+"""
+    Enka client replaying enka.network profiles.
+
+    Profile fixtures (fixtures/enka/api/uid/<uid>.json) are stored as enkapy
+    parses them, since resolving raw avatarInfoList ids needs enkapy's
+    language tables.
+
+    Parameters:
+    enka_url: str - Base url of the stubbed enka.network.
+    loc_url: str - Url of the stubbed localisation store.
+"""
+class StubEnka:
+    def __init__(self, enka_url: str, loc_url: str):
+        self.enka_url = enka_url
+        self.loc_url = loc_url
+
+    async def load_lang(self):
+        await _get_json(self.loc_url)
+
+    async def fetch_user(self, uid):
+        return _to_namespace(await _get_json(f"{self.enka_url}/api/uid/{uid}"))
+
+"""
+    HoyoLab client replaying raw game record responses.
+
+    Parameters:
+    hoyolab_url: str - Base url of the stubbed HoyoLab game record API.
+    cookies: dict - HoyoLab cookies (unused, kept for the genshin.Client signature).
+"""
+class StubGenshinClient:
+    def __init__(self, hoyolab_url: str, cookies: dict = None):
+        self.hoyolab_url = hoyolab_url
+        self.cookies = cookies
+
+    @property
+    def hoyolab_id(self):
+        return (self.cookies or {}).get("ltuid_v2")
+
+    async def _request(self, endpoint: str, uid: int):
+        res = await _get_json(f"{self.hoyolab_url}/game_record/genshin/api/{endpoint}?role_id={uid}&server=os_usa")
+        if res.get("retcode") != 0:
+            raise Exception(f"[{res.get('retcode')}] {res.get('message')}")
+        return res["data"]
+
+    async def get_notes(self, uid: int):
+        data = await self._request("dailyNote", uid)
+        return SimpleNamespace(
+            current_resin=data["current_resin"],
+            max_resin=data["max_resin"],
+            remaining_resin_recovery_time=datetime.timedelta(seconds=int(data["resin_recovery_time"])),
+            current_realm_currency=data["current_home_coin"],
+            max_realm_currency=data["max_home_coin"],
+            remaining_realm_currency_recovery_time=datetime.timedelta(seconds=int(data["home_coin_recovery_time"])),
+            completed_commissions=data["finished_task_num"],
+            max_commissions=data["total_task_num"],
+            expeditions=[SimpleNamespace(finished=expedition["status"] == "Finished") for expedition in data["expeditions"]],
+        )
+
+    async def get_genshin_user(self, uid: int):
+        data = await self._request("index", uid)
+        stats = data["stats"]
+        return SimpleNamespace(
+            info=SimpleNamespace(nickname=data["role"]["nickname"], level=data["role"]["level"]),
+            stats=SimpleNamespace(
+                days_active=stats["active_day_number"],
+                achievements=stats["achievement_number"],
+                spiral_abyss=stats["spiral_abyss"],
+                characters=stats["avatar_number"],
+            ),
+        )
@@ -1,15 +1,41 @@
+import asyncio
+import importlib
 import os
 
+# first, so the startup timings cover every other import
+from utils import startup
+
+import interactions
 from dotenv import load_dotenv
-from apis.enka_api import *
-from apis.genshin_api import *
-from apis.genshin_dev import *
+from utils import components, metrics
+from utils.pagination import create_page_buttons, paginator
 from utils.utils import *
-from interactions import Client, CommandContext, ComponentContext, Intents, LibraryException
-from utils.constants import EMOJIS_TO_ID, CharacterSkills
+from interactions import Choice, Client, CommandContext, ComponentContext, Intents, LibraryException
+from utils.constants import EMOJIS_TO_ID, SERVER_REGIONS, DEFAULT_SERVER_REGION, CharacterSkills
 
+"""
+    API modules (and their heavy dependencies: genshin, enkapy, chompjs, pymongo)
+    are imported inside the handlers that use them, so the commands are
+    registered and the gateway connection starts without waiting for them.
+    on_ready imports them once the bot is connected.
+"""
+API_MODULES = [
+    "utils.mongo_db",
+    "apis.jmp_snapshot",
+    "apis.character_search",
+    "apis.genshin_dev",
+    "apis.books_schedule",
+    "apis.genshin_api",
+    "apis.enka_api",
+    "apis.reminders",
+    "apis.daily_rewards",
+]
+
+startup.mark("imports")
 load_dotenv()
 TOKEN = os.getenv('TOKEN')
+# Discord user id allowed to use /stats
+OWNER_ID = os.getenv('OWNER_ID')
 intents = Intents.DEFAULT
 client = Client(intents=intents, token=TOKEN)
 
@@ -20,6 +46,7 @@ client = Client(intents=intents, token=TOKEN)
         name="help",
         description="Help commands.",
 )
+@metrics.track_command
 async def _help(ctx: CommandContext):
     embed = create_embed(ctx.command.name, "Help message.")
     await ctx.send(embeds=embed)
@@ -34,6 +61,7 @@ async def _help(ctx: CommandContext):
         name="commands",
         description="Show list of commands."
 )
+@metrics.track_command
 async def _commands(ctx: CommandContext):
     commands = client._commands
     commands_str = "All available commands:\n\n"
@@ -79,6 +107,7 @@ async def _commands(ctx: CommandContext):
         ]
 
 )
+@metrics.track_command
 async def _authenticate(
     ctx: CommandContext, 
     ltuid: int, 
@@ -93,6 +122,7 @@ async def _authenticate(
 
     # defer response
     await ctx.defer()
+    from apis.genshin_api import authenticate
 
     auth = await authenticate(discord_id, uid, ltuid, ltmid, ltoken, cookie_token)
 
@@ -122,8 +152,10 @@ async def _authenticate(
             }
         ]
 )
+@metrics.track_command
 async def _summary(ctx: CommandContext, uid: int = False):
     await ctx.defer()
+    from apis.enka_api import get_enka_user_summary
     summary_embeds = await get_enka_user_summary(ctx.author.id, uid)
     await ctx.send(embeds=summary_embeds[0])
 
@@ -149,24 +181,26 @@ async def _summary(ctx: CommandContext, uid: int = False):
             }
         ]
 )
+@metrics.track_command
 async def _showcase(ctx: CommandContext, uid: int = False):
     await ctx.defer()
+    from apis.enka_api import get_user_showcase
+    from utils.mongo_db import get_user_uid
+    uid = uid or await get_user_uid(ctx.author.id)
     # get list of showcased character's embeds
     showcases = await get_user_showcase(uid, ctx.author.id)
-    
-    buttons = []
 
     # Send first showcase
-    interaction = await ctx.send(embeds=showcases[0], components=[buttons])
-    buttons = create_page_buttons(custom_id=interaction.id)
-    await ctx.edit(embeds=showcases[0], components=[buttons])
-    
-    """
-        Event listener for the showcase buttons.
-    """
-    @client.event
-    async def on_component(ctx: ComponentContext):
-        await handle_page_buttons(ctx, buttons, int(interaction.id), showcases)
+    buttons = create_page_buttons("showcase", uid, 0, len(showcases))
+    await ctx.send(embeds=showcases[0], components=buttons)
+
+"""
+    Render every showcase page of a UID for the page buttons.
+"""
+@paginator("showcase")
+async def _showcase_pages(uid: str):
+    from apis.enka_api import get_user_showcase
+    return await get_user_showcase(uid, None)
 
 """
     Fetch the author's notes (realm currency, resin, comissions, and expeditions). 
@@ -183,31 +217,43 @@ async def _showcase(ctx: CommandContext, uid: int = False):
         name="notes",
         description="Show Genshin player's notes."
 )
+@metrics.track_command
 async def _notes(ctx: CommandContext):
     await ctx.defer()
+    from apis.genshin_api import get_notes_embed
     # Get Emojis ids for the embed
     notes_embed = await get_notes_embed(ctx.author.id)
     await ctx.send(embeds=notes_embed)
 
 @client.command(
         name="books",
-        description="Display Genshin character talent books for the day."
+        description="Display Genshin character talent books for the day.",
+        options=[
+            {
+                "name": "region",
+                "description": f"Server region. (Default: {DEFAULT_SERVER_REGION})",
+                "type": 3,
+                "required": False,
+                "choices": [{"name": region, "value": region} for region in SERVER_REGIONS]
+            }
+        ]
 )
-async def _books(ctx: CommandContext):
+@metrics.track_command
+async def _books(ctx: CommandContext, region: str = DEFAULT_SERVER_REGION):
     # List of available talent books as embeds
     await ctx.defer()
-    embeds = get_daily_talent_books_embeds()
-    buttons = []
-    interaction = await ctx.send(embeds=embeds[0], components=buttons)
-    buttons = create_page_buttons(custom_id=interaction.id)
-    await ctx.edit(embeds=embeds[0], components=buttons)
-    
-    """
-        Event listener for the talent book buttons.
-    """
-    @client.event
-    async def on_component(ctx: ComponentContext):
-        await handle_page_buttons(ctx, buttons, int(interaction.id), embeds)
+    from apis import books_schedule
+    embeds = await books_schedule.get_books_embeds(region)
+    buttons = create_page_buttons("books", region, 0, len(embeds))
+    await ctx.send(embeds=embeds[0], components=buttons)
+
+"""
+    Render the talent book pages of a region for the page buttons.
+"""
+@paginator("books")
+async def _books_pages(region: str):
+    from apis import books_schedule
+    return await books_schedule.get_books_embeds(region)
 
         
 @client.command(
@@ -219,6 +265,7 @@ async def _books(ctx: CommandContext):
                 "description": "Character name",
                 "type": 3,
                 "required": True,
+                "autocomplete": True,
             },
             # select combat skills, passive, or constellations
             {
@@ -251,36 +298,91 @@ async def _books(ctx: CommandContext):
             }
         ]
 )
+@metrics.track_command
 async def _skills(ctx: CommandContext, name: str, type: str):
     buttons = []
     await ctx.defer()
-    embeds, scalings = embed_char_skill_info(name, type)
-    interaction = await ctx.send(embeds=embeds[0], components=buttons)
+    from apis.genshin_dev import embed_char_skill_info, get_char_url_name
+    embeds, scalings = await embed_char_skill_info(name, type)
     # Normal Attack, Elemental Skill, Elemental Burst have a Show Details button
     if (type == CharacterSkills.NORMAL_ATTACK.value or
         type == CharacterSkills.ELEMENTAL_SKILL.value or
         type == CharacterSkills.ELEMENTAL_BURST.value) and scalings:
-        buttons = create_page_buttons(custom_id=interaction.id)
-        await ctx.edit(embeds=embeds[0], components=buttons)
-    """
-        Event listener for the Show Details button on Character skills message.
-    """
-    @client.event
-    async def on_component(ctx: ComponentContext):
-        await handle_page_buttons(ctx, buttons, int(interaction.id), embeds, compareName=True)
+        key = f"{get_char_url_name(name)}|{type}"
+        buttons = create_page_buttons("skills", key, 0, len(embeds))
+    await ctx.send(embeds=embeds[0], components=buttons)
+
+"""
+    Render the pages of a character skill (summary and scalings) for the page buttons.
+"""
+@paginator("skills")
+async def _skills_pages(key: str):
+    from apis.genshin_dev import embed_char_skill_info
+    url_name, type = key.split("|")
+    embeds, _ = await embed_char_skill_info(url_name, type)
+    return embeds
+
+"""
+    Suggest character names while typing the name option of /skills.
+"""
+@client.autocomplete(command="skills", name="name")
+async def _skills_name_autocomplete(ctx: CommandContext, user_input: str = ""):
+    from apis import character_search
+    choices = [
+        # the url name is unique and resolved as is by /skills, the label is what the user sees
+        Choice(name=character_search.get_label(url_name), value=url_name)
+        for url_name in character_search.search(user_input)
+    ]
+    await ctx.populate(choices)
 
 @client.command(
         name="daily",
         description="Claim daily rewards from the HoyoLab website."
 )
+@metrics.track_command
 async def _daily(ctx: CommandContext):
+    await ctx.defer()
+    import genshin
+    from apis import daily_rewards
+    from apis.genshin_api import claim_daily_rewards
+    # Opted-in users are claimed in bulk after reset, just report the stored result
+    stored_msg = await daily_rewards.get_stored_claim_message(ctx.author.id)
+    if stored_msg:
+        await ctx.send(stored_msg)
+        return
     try:
         success_msg = await claim_daily_rewards(ctx.author.id)
+        await daily_rewards.save_claim_message(ctx.author.id, "claimed", success_msg)
         await ctx.send(success_msg)
     except genshin.AlreadyClaimed:
         # Catch api error when trying to claim daily rewards again
+        await daily_rewards.save_claim_message(ctx.author.id, "already_claimed", genshin.AlreadyClaimed.msg)
         await ctx.send(genshin.AlreadyClaimed.msg)
 
+"""
+    Opt in or out of automatic daily reward claims after each daily reset.
+
+    Requirements: Cookies & Authentication Tokens
+"""
+@client.command(
+        name="autoclaim",
+        description="Automatically claim your daily rewards every day.",
+        options=[
+            {
+                "name": "enabled",
+                "description": "Turn automatic claims on or off.",
+                "type": 5,
+                "required": True,
+            }
+        ]
+)
+@metrics.track_command
+async def _autoclaim(ctx: CommandContext, enabled: bool):
+    await ctx.defer(ephemeral=True)
+    from apis.daily_rewards import set_auto_claim
+    message = await set_auto_claim(ctx.author.id, enabled)
+    await ctx.send(message, ephemeral=True)
+
 
 @client.command(
         name="redeem",
@@ -294,15 +396,125 @@ async def _daily(ctx: CommandContext):
             }
         ]
 )
+@metrics.track_command
 async def _redeem(ctx: CommandContext, code: str):
     await ctx.defer()
+    from apis.genshin_api import redeem_code
     success_msg = await redeem_code(code, ctx.author.id)
     await ctx.send(success_msg)
 
+"""
+    Opt in or out of DM reminders when resin or realm currency is full.
+
+    Requirements: Cookies & Authentication Tokens
+"""
+@client.command(
+        name="reminders",
+        description="Get a DM when your resin or realm currency is full.",
+        options=[
+            {
+                "name": "enabled",
+                "description": "Turn reminders on or off.",
+                "type": 5,
+                "required": True,
+            }
+        ]
+)
+@metrics.track_command
+async def _reminders(ctx: CommandContext, enabled: bool):
+    await ctx.defer(ephemeral=True)
+    from apis import reminders
+    if enabled:
+        message = await reminders.enable_reminders(ctx.author.id)
+        await ctx.send(message, ephemeral=True)
+    else:
+        await reminders.disable_reminders(ctx.author.id)
+        await ctx.send("Reminders disabled.", ephemeral=True)
+
+"""
+    Show command latencies, upstream calls, cache hit rates and event loop lag.
+    Only available to the bot owner (OWNER_ID).
+"""
+@client.command(
+        name="stats",
+        description="Show bot performance statistics (owner only).",
+)
+@metrics.track_command
+async def _stats(ctx: CommandContext):
+    if not OWNER_ID or str(ctx.author.id) != OWNER_ID:
+        await ctx.send("This command is only available to the bot owner.", ephemeral=True)
+        return
+    stats = metrics.get_stats()
+    sections = list(stats.items())
+    embed = create_embed(sections[0][0], "\n".join(sections[0][1]) or "No data yet.", title="Bot Statistics")
+    for section, lines in sections[1:]:
+        embed.add_field(name=section, value="\n".join(lines)[:1024] or "No data yet.", inline=False)
+    await ctx.send(embeds=embed, ephemeral=True)
+
+async def send_dm(discord_id: str, message: str):
+    user = await interactions.get(client, interactions.User, object_id=int(discord_id))
+    await user.send(message)
+
+"""
+    Import the API modules, yielding to the event loop between modules so the
+    gateway connection is kept serviced.
+"""
+async def import_api_modules():
+    for module in API_MODULES:
+        importlib.import_module(module)
+        await asyncio.sleep(0)
+
 @client.event
 async def on_ready():
-    # sync commands
-    pass
+    startup.mark("gateway ready")
+    # sample event loop lag and serve the Prometheus metrics endpoint
+    await metrics.start()
+    # open the Mongo connection now that the gateway is up. If Mongo is down,
+    # everything that does not need it still starts
+    from utils import mongo_db
+    mongo_connected = await mongo_db.try_connect()
+    startup.mark("mongo connected")
+    await import_api_modules()
+    startup.mark("api modules imported")
+    from apis import asset_manifest, books_schedule, enka_assets, jmp_snapshot
+    from apis.enka_api import start_enka_lang_refresh
+    from apis.genshin_dev import warm_skills_cache
+    # keep the genshin.jmp.blue snapshot fresh in the background
+    jmp_snapshot.start_refresh()
+    # resolve asset urls once per data version instead of per render
+    asset_manifest.start_build()
+    # pre-render /skills embeds for the current data version
+    await warm_skills_cache()
+    # build /books embeds at each region's daily reset
+    books_schedule.start_schedule()
+    # keep the Enka avatar index in sync with the enka.network bundle
+    enka_assets.start_refresh()
+    # load Enka language tables once, reload only when they change upstream
+    start_enka_lang_refresh()
+    if mongo_connected:
+        await start_mongo_services()
+    else:
+        # start the rest once a background retry reaches Mongo
+        mongo_db.start_reconnect(start_mongo_services)
+    startup.mark("services started")
+    startup.report()
+
+"""
+    Start the services that need Mongo.
+"""
+async def start_mongo_services():
+    from apis import daily_rewards, reminders
+    # resume resin/realm currency reminders saved in Mongo
+    await reminders.start_reminders(send_dm)
+    # claim daily rewards for opted-in users after every reset
+    daily_rewards.start_daily_claims()
+
+"""
+    Single listener for every button click, dispatched through the component registry.
+"""
+@client.event
+async def on_component(ctx: ComponentContext):
+    await components.dispatch(ctx)
 
 @client.event
 async def on_command_error(ctx, error):
@@ -310,4 +522,5 @@ async def on_command_error(ctx, error):
     print(error)
     await ctx.send(str(error))
 
+startup.mark("commands registered")
 client.start()
\ No newline at end of file
@@ -0,0 +1,101 @@
+import sys
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+"""
+    In-process LRU cache with optional entry TTL and memory budget.
+
+    Parameters:
+    maxsize: int - Maximum number of entries (None for no limit).
+    max_bytes: int - Maximum estimated size of all values (None for no limit).
+    ttl: float - Seconds an entry stays valid (None for no expiry).
+    sizeof: function - Estimates the size in bytes of a value.
+"""
+class LRUCache:
+    def __init__(self, maxsize: int = None, max_bytes: int = None, ttl: float = None, sizeof=sys.getsizeof):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        # key -> (value, expires_at, size)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    """
+        Get a value from the cache.
+
+        Returns:
+        The cached value, or default if the key is missing or expired.
+    """
+    def get(self, key, default=None, count=True):
+        entry = self._entries.get(key)
+        if entry is None:
+            if count:
+                self.misses += 1
+            return default
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.pop(key)
+            if count:
+                self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        if count:
+            self.hits += 1
+        return value
+
+    """
+        Add or replace a value, evicting the least recently used entries
+        until the cache fits its size limits.
+
+        Parameters:
+        ttl: float - Optional TTL for this entry, overriding the cache TTL.
+    """
+    def set(self, key, value, ttl: float = None):
+        self.pop(key)
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        self._entries[key] = (value, expires_at, size)
+        self.total_bytes += size
+        self._evict()
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self.total_bytes -= entry[2]
+        return entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    """
+        Remove every expired entry.
+    """
+    def expire(self):
+        now = time.monotonic()
+        for key, (_, expires_at, _) in list(self._entries.items()):
+            if expires_at is not None and expires_at <= now:
+                self.pop(key)
+
+    def _evict(self):
+        while self._entries and (
+                (self.maxsize is not None and len(self._entries) > self.maxsize) or
+                (self.max_bytes is not None and self.total_bytes > self.max_bytes)):
+            key = next(iter(self._entries))
+            self.pop(key)
@@ -0,0 +1,36 @@
+from interactions import ComponentContext
+
+"""
+    Central registry of component handlers.
+
+    A single on_component listener dispatches every click with one dict lookup
+    on the custom_id prefix. Handlers keep no per-message state: everything a
+    click needs is encoded in the custom_id (see utils/pagination.py), so they
+    never expire and keep working after a restart.
+"""
+# custom_id prefix (text before the first ":") -> handler
+prefix_handlers = {}
+
+"""
+    Register the handler of every custom_id starting with "<prefix>:".
+
+    Parameters:
+    prefix: str - custom_id prefix.
+    handler: function - Coroutine function called with the ComponentContext.
+"""
+def register_prefix(prefix: str, handler):
+    prefix_handlers[prefix] = handler
+
+"""
+    Dispatch a component click to its registered handler.
+
+    Returns:
+    bool - True if a handler was found.
+"""
+async def dispatch(ctx: ComponentContext):
+    custom_id = str(ctx.custom_id)
+    handler = prefix_handlers.get(custom_id.split(":", 1)[0])
+    if handler is None:
+        return False
+    await handler(ctx)
+    return True
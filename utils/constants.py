@@ -11,6 +11,20 @@ WEEKDAYS = {
     7: 'Sunday'
 }
 
+"""
+    Map of server regions to their UTC offset (hours). Daily reset happens at
+    SERVER_RESET_HOUR server time.
+"""
+SERVER_REGIONS = {
+    "America": -5,
+    "Europe": 1,
+    "Asia": 8,
+}
+
+SERVER_RESET_HOUR = 4
+
+DEFAULT_SERVER_REGION = "America"
+
 """
     Map of character names to a url-friendly version for genshin_dev.py
 """
@@ -20,11 +34,31 @@ CHAR_TO_URL = {
     "Sangonomiya Kokomi": "kokomi",
     "Kamisato Ayaka": "ayaka",
     "Kaedehara Kazuha": "kazuha",
-    "Kamisato Ayato:": "ayato",
+    "Kamisato Ayato": "ayato",
     "Childe": "tartaglia",
 
 }
 
+"""
+    Map of common nicknames to the character's url-friendly name, used by the
+    character search index.
+"""
+CHARACTER_ALIASES = {
+    "Childe": "tartaglia",
+    "Ei": "raiden",
+    "Baal": "raiden",
+    "Shogun": "raiden",
+    "Ajax": "tartaglia",
+    "Hutao": "hu-tao",
+    "Wanderer": "wanderer",
+    "Scaramouche": "wanderer",
+    "Kokomi": "kokomi",
+    "Ayaka": "ayaka",
+    "Ayato": "ayato",
+    "Kazuha": "kazuha",
+    "Sara": "sara",
+}
+
 """
     Map of character url-friendly name to their regular name.
 """
@@ -90,6 +124,11 @@ EMOJIS_TO_ID = {
     "daily_commission": "<:daily_commission:1212464737267490876>",
 }
 
+"""
+    Thumbnail of the /notes embed.
+"""
+NOTES_THUMBNAIL = "https://static.wikia.nocookie.net/gensin-impact/images/7/75/Icon_Adventurer_Handbook.png/revision/latest?cb=20230427093923"
+
 """
     Enum of character skills.
 """
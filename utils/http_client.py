@@ -0,0 +1,98 @@
+import json
+import os
+from urllib.parse import urlparse
+
+import aiohttp
+from multidict import CIMultiDict
+
+from utils import metrics
+
+"""
+    Shared async HTTP client used by every module in apis/.
+
+    A single aiohttp session is kept for the lifetime of the bot so that
+    connections are pooled and kept alive per host instead of opening a new
+    connection for every request.
+"""
+# Total seconds allowed for a request, and for establishing the connection
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+# Connection pool limits
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', 100))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv('HTTP_MAX_CONNECTIONS_PER_HOST', 10))
+# Seconds an idle connection is kept open for reuse
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 60))
+
+_session = None
+
+class HttpResponse:
+    __slots__ = ("status", "url", "headers", "content")
+
+    def __init__(self, status: int, url: str, headers: CIMultiDict, content: bytes):
+        self.status = status
+        self.url = url
+        self.headers = headers
+        self.content = content
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+def get_session():
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        )
+        timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+"""
+    Send a request through the shared session.
+
+    Parameters:
+    method: str - HTTP method.
+    url: str - Request url.
+    headers: dict - Optional request headers.
+    timeout: float - Optional total timeout overriding HTTP_TIMEOUT.
+
+    Returns:
+    HttpResponse - Status, final url (after redirects), headers (case-insensitive) and body.
+"""
+async def request(method: str, url: str, headers: dict = None, timeout: float = None):
+    session = get_session()
+    kwargs = {}
+    if timeout is not None:
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+    host = urlparse(url).hostname
+    with metrics.track_upstream(host):
+        async with session.request(method, url, headers=headers, **kwargs) as response:
+            content = await response.read()
+    if response.status >= 400:
+        metrics.upstream_errors.inc(host=host, error=f"HTTP {response.status}")
+    return HttpResponse(response.status, str(response.url), CIMultiDict(response.headers), content)
+
+async def get(url: str, headers: dict = None, timeout: float = None):
+    return await request("GET", url, headers=headers, timeout=timeout)
+
+async def head(url: str, headers: dict = None, timeout: float = None):
+    return await request("HEAD", url, headers=headers, timeout=timeout)
+
+async def get_json(url: str, headers: dict = None, timeout: float = None):
+    response = await get(url, headers=headers, timeout=timeout)
+    return response.json()
+
+async def close():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,328 @@
+import asyncio
+import contextlib
+import functools
+import math
+import os
+import time
+
+from aiohttp import web
+
+"""
+    Prometheus-style metrics for commands, outbound calls, caches and the event loop.
+
+    Metrics are kept in memory, rendered in the Prometheus text format on a
+    local http endpoint (METRICS_HOST:METRICS_PORT/metrics), and summarised by
+    the owner-only /stats command.
+"""
+# Address of the metrics endpoint, METRICS_PORT=0 disables it
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))
+# Seconds between event loop lag samples
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', 1))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+_metrics = []
+# name -> LRUCache
+_caches = {}
+_lag_task = None
+_runner = None
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: dict):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _format_value(value: float):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # tuple of label values -> value
+        self._values = {}
+        _metrics.append(self)
+
+    def _key(self, labels: dict):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple):
+        return dict(zip(self.labelnames, key))
+
+    def label_values(self):
+        return list(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    """
+        Sum the values whose labels include the given ones (e.g. every error of a command).
+    """
+    def total(self, **labels):
+        matches = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        return sum(value for key, value in self._values.items() if all(key[i] == expected for i, expected in matches))
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+"""
+    Histogram with cumulative buckets, as in the Prometheus client libraries.
+"""
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            # [count per bucket (not cumulative), sum, count]
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][i] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    def count(self, **labels):
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def total(self, **labels):
+        entry = self._values.get(self._key(labels))
+        return entry[1] if entry else 0.0
+
+    """
+        Estimate a quantile from the buckets, interpolating linearly within
+        the bucket it falls in (like Prometheus' histogram_quantile).
+
+        Returns:
+        float - Estimated value, or None if nothing was observed.
+    """
+    def quantile(self, q: float, **labels):
+        entry = self._values.get(self._key(labels))
+        if not entry or not entry[2]:
+            return None
+        rank = q * entry[2]
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets, entry[0]):
+            if bucket_count and cumulative + bucket_count >= rank:
+                if bound == math.inf:
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound if bound != math.inf else lower
+        return lower
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, (bucket_counts, total, count) in sorted(self._values.items()):
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+command_latency = Histogram("kuki_command_duration_seconds", "Slash command latency.", ("command",))
+command_errors = Counter("kuki_command_errors_total", "Slash commands that raised, by error type.", ("command", "error"))
+upstream_latency = Histogram("kuki_upstream_request_duration_seconds", "Outbound call latency by upstream host.", ("host",))
+upstream_errors = Counter("kuki_upstream_errors_total", "Failed outbound calls by upstream host and error.", ("host", "error"))
+loop_lag = Histogram("kuki_event_loop_lag_seconds", "Delay of the event loop waking up a sleeping task.", buckets=LOOP_LAG_BUCKETS)
+last_loop_lag = Gauge("kuki_event_loop_lag_last_seconds", "Last measured event loop lag.")
+daily_claims = Gauge("kuki_daily_claims_users", "Users of the current (or last) daily reward batch, by state.", ("state",))
+daily_claims_throughput = Gauge("kuki_daily_claims_users_per_second", "Users processed per second by the current (or last) daily reward batch.")
+
+"""
+    Report an LRUCache's hit, miss, size and memory counters under a name.
+
+    Parameters:
+    name: str - Cache name (label value).
+    cache: LRUCache - The cache.
+
+    Returns:
+    LRUCache - The cache, so a cache can be registered where it is created.
+"""
+def register_cache(name: str, cache):
+    _caches[name] = cache
+    return cache
+
+def _render_caches():
+    families = [
+        ("kuki_cache_hits_total", "counter", "Cache lookups that found a valid entry.", lambda cache: cache.hits),
+        ("kuki_cache_misses_total", "counter", "Cache lookups that found no valid entry.", lambda cache: cache.misses),
+        ("kuki_cache_entries", "gauge", "Entries currently cached.", len),
+        ("kuki_cache_bytes", "gauge", "Estimated size of the cached values (byte-limited caches only).", lambda cache: cache.total_bytes),
+    ]
+    lines = []
+    for name, type, documentation, value in families:
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {type}"]
+        for cache_name, cache in sorted(_caches.items()):
+            lines.append(f"{name}{_format_labels({'cache': cache_name})} {value(cache)}")
+    return lines
+
+"""
+    Render every metric in the Prometheus text exposition format.
+
+    Returns:
+    str
+"""
+def render():
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    lines += _render_caches()
+    return "\n".join(lines) + "\n"
+
+"""
+    Decorator recording the latency and errors of a slash command handler.
+    Goes under @client.command, the command name is read from the context.
+"""
+def track_command(coro):
+    @functools.wraps(coro)
+    async def wrapper(ctx, *args, **kwargs):
+        command = getattr(getattr(ctx, "command", None), "name", None) or coro.__name__.lstrip('_')
+        start = time.perf_counter()
+        try:
+            return await coro(ctx, *args, **kwargs)
+        except Exception as e:
+            command_errors.inc(command=command, error=type(e).__name__)
+            raise
+        finally:
+            command_latency.observe(time.perf_counter() - start, command=command)
+    return wrapper
+
+"""
+    Context manager recording the latency of an outbound call, and its error
+    type if it raises.
+
+    Parameters:
+    host: str - Upstream host (label value).
+"""
+@contextlib.contextmanager
+def track_upstream(host: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        upstream_errors.inc(host=host, error=type(e).__name__)
+        raise
+    finally:
+        upstream_latency.observe(time.perf_counter() - start, host=host)
+
+"""
+    Summarise the metrics for the /stats command.
+
+    Returns:
+    dict(section: str, list of str) - Lines per section.
+"""
+def get_stats():
+    def ms(seconds):
+        return f"{seconds * 1000:.0f}ms" if seconds is not None else "-"
+
+    commands = []
+    for (command,) in sorted(command_latency.label_values()):
+        errors = command_errors.total(command=command)
+        commands.append(
+            f"/{command}: {command_latency.count(command=command)} calls, "
+            f"p50 {ms(command_latency.quantile(0.5, command=command))}, "
+            f"p95 {ms(command_latency.quantile(0.95, command=command))}, {errors} errors")
+
+    upstreams = []
+    for (host,) in sorted(upstream_latency.label_values()):
+        errors = upstream_errors.total(host=host)
+        upstreams.append(
+            f"{host}: {upstream_latency.count(host=host)} calls, "
+            f"p95 {ms(upstream_latency.quantile(0.95, host=host))}, {errors} errors")
+
+    caches = []
+    for name, cache in sorted(_caches.items()):
+        lookups = cache.hits + cache.misses
+        hit_rate = f"{cache.hits / lookups:.0%}" if lookups else "-"
+        caches.append(f"{name}: {hit_rate} hits ({lookups} lookups), {len(cache)} entries")
+
+    loop = [
+        f"last {ms(last_loop_lag.get())}, p99 {ms(loop_lag.quantile(0.99))}",
+    ]
+
+    claims = []
+    if daily_claims.label_values():
+        claims.append(
+            f"{daily_claims.get(state='done')}/{daily_claims.get(state='total')} done, "
+            f"{daily_claims.get(state='claimed')} claimed, {daily_claims.get(state='already_claimed')} already claimed, "
+            f"{daily_claims.get(state='failed')} failed, {daily_claims.get(state='retries')} retries, "
+            f"{daily_claims_throughput.get():.1f} users/s")
+    return {
+        "Commands": commands,
+        "Upstreams": upstreams,
+        "Caches": caches,
+        "Event loop lag": loop,
+        "Daily claims": claims,
+    }
+
+async def _monitor_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, loop.time() - start - LOOP_LAG_INTERVAL)
+        loop_lag.observe(lag)
+        last_loop_lag.set(lag)
+
+async def _handle_metrics(request: web.Request):
+    return web.Response(body=render().encode('utf-8'), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+"""
+    Start sampling the event loop lag and serve the metrics endpoint (unless
+    METRICS_PORT is 0). Safe to call more than once.
+"""
+async def start():
+    global _lag_task, _runner
+    if _lag_task is None or _lag_task.done():
+        _lag_task = asyncio.get_running_loop().create_task(_monitor_loop_lag())
+    if METRICS_PORT and _runner is None:
+        app = web.Application()
+        app.router.add_get('/metrics', _handle_metrics)
+        _runner = web.AppRunner(app, access_log=None)
+        await _runner.setup()
+        try:
+            await web.TCPSite(_runner, METRICS_HOST, METRICS_PORT).start()
+            print(f"Metrics served on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"Could not serve metrics on {METRICS_HOST}:{METRICS_PORT}: {e}")
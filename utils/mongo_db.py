@@ -1,61 +1,397 @@
+import asyncio
 import datetime
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+
+from utils import metrics
+from utils.cache import LRUCache
 
 
 load_dotenv()
 MONGODB_URI = os.environ['MONGODB_URI']
-client = MongoClient(MONGODB_URI)
+# Connection pool size, and number of threads running queries for the event loop
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 10))
+MONGO_MAX_WORKERS = int(os.getenv('MONGO_MAX_WORKERS', MONGO_MAX_POOL_SIZE))
+# Host label of database operations in the upstream metrics
+MONGO_HOST = "mongodb"
+# Seconds before a database operation is abandoned
+MONGO_TIMEOUT = float(os.getenv('MONGO_TIMEOUT', 5))
+# Seconds between connection attempts while Mongo is unreachable
+MONGO_RETRY_INTERVAL = float(os.getenv('MONGO_RETRY_INTERVAL', 30))
+# Number of user records cached in memory, and seconds before a cached record is re-read
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 300))
+
+"""
+    Create the Mongo client. A "mongomock://" uri uses an in-process
+    mongomock client instead of a real server (tests, benchmarks).
+"""
+def create_client(uri: str = MONGODB_URI):
+   if uri.startswith('mongomock://'):
+      import mongomock
+      return mongomock.MongoClient()
+   return MongoClient(
+      uri,
+      maxPoolSize=MONGO_MAX_POOL_SIZE,
+      serverSelectionTimeoutMS=int(MONGO_TIMEOUT * 1000),
+      connectTimeoutMS=int(MONGO_TIMEOUT * 1000),
+      socketTimeoutMS=int(MONGO_TIMEOUT * 1000),
+   )
+
+# Created on first use (or by connect() once the bot is ready), never at import
+client = None
+_client_lock = threading.Lock()
+# pymongo is synchronous, queries run here so they never block the event loop
+executor = ThreadPoolExecutor(max_workers=MONGO_MAX_WORKERS, thread_name_prefix='mongo')
+_reconnect_task = None
+
+def get_client():
+   global client
+   if client is None:
+      with _client_lock:
+         if client is None:
+            client = create_client()
+   return client
+
+"""
+    Replace the Mongo client (e.g. with a mongomock client in tests).
+"""
+def set_client(new_client):
+   global client
+   client = new_client
+
+"""
+    Write-through cache of user records in front of the users collection.
+
+    dict(discord_id: str, dict("doc": dict, "fields": set of known fields, or None if the whole document is known))
+"""
+user_cache = metrics.register_cache("users", LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL))
+
+def _cache_user(discord_id, doc: dict, fields=None):
+   discord_id = str(discord_id)
+   entry = user_cache.get(discord_id, count=False) or {"doc": {}, "fields": set()}
+   if fields is None or entry["fields"] is None:
+      known_fields = None
+   else:
+      known_fields = entry["fields"] | set(fields)
+   user_cache.set(discord_id, {"doc": {**entry["doc"], **doc}, "fields": known_fields})
+
+def _get_cached_fields(discord_id, fields: list = None):
+   entry = user_cache.get(str(discord_id))
+   if entry is None:
+      return None
+   if entry["fields"] is None:
+      doc = entry["doc"]
+   elif fields is not None and set(fields) <= entry["fields"]:
+      doc = entry["doc"]
+   else:
+      return None
+   if fields is None:
+      return dict(doc)
+   return {field: doc[field] for field in fields if field in doc}
+
+def invalidate_user(discord_id: int):
+   user_cache.pop(str(discord_id))
+
+def get_users_collection():
+   # Get reference to the collection Users of the Discord Users database
+   return get_client()['discord_users']['users']
+
+def get_reminders_collection():
+   # Get reference to the collection Reminders of the Discord Users database
+   return get_client()['discord_users']['reminders']
+
+def get_daily_claims_collection():
+   # Get reference to the collection Daily Claims of the Discord Users database
+   return get_client()['discord_users']['daily_claims']
+
+def get_daily_claim_batches_collection():
+   # Get reference to the collection Daily Claim Batches of the Discord Users database
+   return get_client()['discord_users']['daily_claim_batches']
+
+"""
+    Run a blocking pymongo call on the Mongo executor.
+
+    Parameters:
+      fn: function - pymongo call.
+      timeout: float - Seconds before the operation is abandoned.
+
+    Returns:
+      The result of the call.
+"""
+async def run(fn, *args, timeout: float = MONGO_TIMEOUT, **kwargs):
+   loop = asyncio.get_running_loop()
+   with metrics.track_upstream(MONGO_HOST):
+      future = loop.run_in_executor(executor, lambda: fn(*args, **kwargs))
+      return await asyncio.wait_for(future, timeout=timeout)
+
+"""
+    Create the Mongo client and check the connection with a ping, on the
+    Mongo executor so the event loop is never blocked. Safe to call more than once.
+
+    Returns:
+      The Mongo client.
+"""
+async def connect():
+   await run(lambda: get_client().admin.command('ping'))
+   return client
+
+"""
+    Connect and create the indexes, without raising.
+
+    A failed index build (e.g. duplicate discord_ids already stored) is only
+    logged: it does not stop the queries from working.
+
+    Returns:
+      bool - True if Mongo is reachable.
+"""
+async def try_connect():
+   try:
+      await connect()
+   except Exception as e:
+      print(f"Could not connect to Mongo: {e!r}")
+      return False
+   try:
+      await ensure_indexes()
+   except Exception as e:
+      print(f"Could not create the Mongo indexes: {e!r}")
+   return True
+
+async def _reconnect(on_connect):
+   while not await try_connect():
+      await asyncio.sleep(MONGO_RETRY_INTERVAL)
+   print("Connected to Mongo")
+   if on_connect is not None:
+      try:
+         await on_connect()
+      except Exception as e:
+         print(f"Could not start the services using Mongo: {e!r}")
+
+"""
+    Retry connecting every MONGO_RETRY_INTERVAL seconds in the background.
+    Safe to call more than once.
+
+    Parameters:
+      on_connect: function - Optional coroutine function run once connected.
+"""
+def start_reconnect(on_connect=None):
+   global _reconnect_task
+   if _reconnect_task is None or _reconnect_task.done():
+      _reconnect_task = asyncio.get_event_loop().create_task(_reconnect(on_connect))
+   return _reconnect_task
 
 """
     Add a discord user to the database.
 
     Parameters:
       payload: dict - Discord user information.
-   
+
     Returns:
       The user added to the database.
 """
-def add_to_users(payload: dict):
+async def add_to_users(payload: dict):
    discord_id = payload['discord_id']
    uid = payload['uid']
    authentication_tokens = payload['authentication_tokens']
 
-   # Get reference to Discord Users database
-   db = client['discord_users']
+   users_collection = get_users_collection()
 
-   # Get reference to the collection Users
-   users_collection = db['users']
-   
    # Add user to the collection
-   user_added = users_collection.insert_one({
+   user = {
       "discord_id": str(discord_id),
       "uid": uid,
-      "authentication_tokens": authentication_tokens, 
-   })
+      "authentication_tokens": authentication_tokens,
+   }
+   user_added = await run(users_collection.insert_one, dict(user))
+   _cache_user(discord_id, user)
    return user_added
 
-def get_user_from_db(discord_id: int):
-   # Get reference to Discord Users database
-   db = client['discord_users']
+async def get_user_from_db(discord_id: int):
+   cached = _get_cached_fields(discord_id)
+   if cached is not None:
+      return cached
 
-   # Get reference to the collection Users
-   users_collection = db['users']
+   users_collection = get_users_collection()
 
    # Find user by discord_id
-   user = users_collection.find_one({"discord_id": str(discord_id)})
+   user = await run(users_collection.find_one, {"discord_id": str(discord_id)})
+   if user:
+      _cache_user(discord_id, user)
    return user
 
-def update_user(discord_id: int, payload: dict):
-   # Get reference to Discord Users database
-   db = client['discord_users']
-
-   # Get reference to the collection Users
-   users_collection = db['users']
+async def update_user(discord_id: int, payload: dict):
+   users_collection = get_users_collection()
 
    # Update user by discord_id
-   user = users_collection.update_one({"discord_id": str(discord_id)}, {"$set": payload})
+   user = await run(users_collection.update_one, {"discord_id": str(discord_id)}, {"$set": payload})
+   # Nothing to cache for a user who is not in the database
+   if user.matched_count:
+      _cache_user(discord_id, payload, fields=payload.keys())
+
+   return user
+
+"""
+    Create the indexes used by the user lookups. Safe to call on every startup.
+"""
+async def ensure_indexes():
+   users_collection = get_users_collection()
+   return await run(users_collection.create_index, "discord_id", unique=True)
+
+"""
+    Get one user's document, reading only the requested fields.
+
+    Parameters:
+      discord_id: int - Discord user id.
+      fields: list - Fields to read.
+
+    Returns:
+      dict - The requested fields, or None if the user is not in the database.
+"""
+async def get_user_fields(discord_id: int, fields: list):
+   cached = _get_cached_fields(discord_id, fields)
+   if cached is not None:
+      return cached
+
+   users_collection = get_users_collection()
+   projection = {field: 1 for field in fields}
+   projection["_id"] = 0
+   user = await run(users_collection.find_one, {"discord_id": str(discord_id)}, projection)
+   if user is not None:
+      _cache_user(discord_id, user, fields=fields)
+   return user
+
+async def get_user_uid(discord_id: int):
+   user = await get_user_fields(discord_id, ["uid"])
+   return user.get("uid") if user else None
+
+async def get_user_cookies(discord_id: int):
+   user = await get_user_fields(discord_id, ["authentication_tokens"])
+   return user.get("authentication_tokens") if user else None
+
+"""
+    Get many users in one query.
+
+    Parameters:
+      discord_ids: list - Discord user ids.
+      fields: list - Optional fields to read (all fields if omitted).
+
+    Returns:
+      dict(discord_id: str, user document)
+"""
+async def get_users(discord_ids: list, fields: list = None):
+   users_collection = get_users_collection()
+   projection = None
+   if fields:
+      projection = {field: 1 for field in fields}
+      projection["discord_id"] = 1
+      projection["_id"] = 0
+   query = {"discord_id": {"$in": [str(discord_id) for discord_id in discord_ids]}}
+   users = await run(lambda: list(users_collection.find(query, projection)))
+   return {user["discord_id"]: user for user in users}
+
+"""
+    Store a user's HoyoLab cookies (and optionally UID) in a single atomic upsert.
+
+    Parameters:
+      discord_id: int - Discord user id.
+      authentication_tokens: dict - HoyoLab cookies.
+      uid: int - Optional Genshin player UID.
+
+    Returns:
+      dict - The user's uid and cookies before the update, or None for a new user.
+"""
+async def upsert_user_auth(discord_id: int, authentication_tokens: dict, uid: int = None):
+   users_collection = get_users_collection()
+   payload = {"authentication_tokens": authentication_tokens}
+   if uid:
+      payload["uid"] = uid
+   previous = await run(
+      users_collection.find_one_and_update,
+      {"discord_id": str(discord_id)},
+      {"$set": payload},
+      projection={"_id": 0, "uid": 1, "authentication_tokens": 1},
+      upsert=True,
+      return_document=ReturnDocument.BEFORE,
+   )
+   _cache_user(discord_id, payload, fields=payload.keys())
+   return previous
+
+"""
+    Create or update a user's resin/realm currency reminder state.
+
+    Parameters:
+      discord_id: int - Discord user id.
+      payload: dict - Reminder fields to set.
+"""
+async def set_reminder(discord_id: int, payload: dict):
+   reminders_collection = get_reminders_collection()
+   return await run(
+      reminders_collection.update_one,
+      {"discord_id": str(discord_id)},
+      {"$set": payload},
+      upsert=True,
+   )
+
+async def delete_reminder(discord_id: int):
+   reminders_collection = get_reminders_collection()
+   return await run(reminders_collection.delete_one, {"discord_id": str(discord_id)})
+
+"""
+    Get every saved reminder.
+
+    Returns:
+      list of dict - Reminder documents.
+"""
+async def get_reminders():
+   reminders_collection = get_reminders_collection()
+   return await run(lambda: list(reminders_collection.find({}, {"_id": 0})))
+
+"""
+    Get the ids of every user who opted in to automatic daily reward claims.
+
+    Returns:
+      list of str - Discord user ids.
+"""
+async def get_auto_claim_user_ids():
+   users_collection = get_users_collection()
+   users = await run(lambda: list(users_collection.find({"auto_claim": True}, {"_id": 0, "discord_id": 1})))
+   return [user["discord_id"] for user in users]
+
+"""
+    Store the results of a daily reward batch in a single bulk write.
+
+    Parameters:
+      results: list of dict - Claim results with "discord_id" and "date" keys.
+"""
+async def save_daily_claims(results: list):
+   if not results:
+      return None
+   daily_claims_collection = get_daily_claims_collection()
+   operations = [
+      UpdateOne({"discord_id": str(result["discord_id"]), "date": result["date"]}, {"$set": result}, upsert=True)
+      for result in results
+   ]
+   return await run(daily_claims_collection.bulk_write, operations, ordered=False)
+
+async def get_daily_claim(discord_id: int, date: str):
+   daily_claims_collection = get_daily_claims_collection()
+   return await run(daily_claims_collection.find_one, {"discord_id": str(discord_id), "date": date}, {"_id": 0})
+
+"""
+    Record that the daily reward batch ran for a claim date.
+
+    Parameters:
+      date: str - Claim date (UTC+8), ISO format.
+      summary: dict - Batch progress counters.
+"""
+async def save_daily_claim_batch(date: str, summary: dict):
+   batches_collection = get_daily_claim_batches_collection()
+   return await run(batches_collection.update_one, {"date": date}, {"$set": {**summary, "date": date}}, upsert=True)
 
-   return user
\ No newline at end of file
+async def get_daily_claim_batch(date: str):
+   batches_collection = get_daily_claim_batches_collection()
+   return await run(batches_collection.find_one, {"date": date}, {"_id": 0})
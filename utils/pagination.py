@@ -0,0 +1,72 @@
+from interactions import Button, ButtonStyle, ComponentContext
+
+from utils import components
+
+"""
+    Stateless pagination.
+
+    Page buttons carry everything needed to render the target page in their
+    custom_id ("page:<kind>:<key>:<page>:<direction>"). A click re-renders the
+    page from the paginator registered for <kind>, which reads from the bot's
+    caches, so no embeds are kept per message and buttons keep working after a
+    restart.
+"""
+PREFIX = "page"
+# kind -> coroutine function (key) -> list of Embeds
+paginators = {}
+
+"""
+    Register a coroutine function rendering every page of a paginator kind.
+
+    Parameters:
+    kind: str - Paginator kind, stored in the button custom_id.
+"""
+def paginator(kind: str):
+    def decorator(render):
+        paginators[kind] = render
+        return render
+    return decorator
+
+"""
+    Create prev/next buttons for a page.
+
+    Parameters:
+    kind: str - Paginator kind.
+    key: str - Paginator key (e.g. uid, region), must not contain ":".
+    page: int - Index of the current page.
+    total_pages: int - Number of pages.
+
+    Returns:
+    list of Buttons
+"""
+def create_page_buttons(kind: str, key: str, page: int, total_pages: int):
+    prev = Button(
+        style=ButtonStyle.SECONDARY,
+        label="prev",
+        custom_id=f"{PREFIX}:{kind}:{key}:{(page - 1) % total_pages}:p",
+    )
+    next = Button(
+        style=ButtonStyle.PRIMARY,
+        label="next",
+        custom_id=f"{PREFIX}:{kind}:{key}:{(page + 1) % total_pages}:n",
+    )
+    return [prev, next]
+
+"""
+    Render the page targeted by a clicked page button.
+"""
+async def handle_page_button(ctx: ComponentContext):
+    _, kind, key, page, _ = str(ctx.custom_id).split(":")
+    render = paginators.get(kind)
+    if render is None:
+        return
+    # Rendering may need upstream calls (e.g. an expired Enka profile after a
+    # restart), which can outlast Discord's 3 second limit to respond
+    await ctx.defer(edit_origin=True)
+    embeds = await render(key)
+    if not embeds:
+        return
+    page = int(page) % len(embeds)
+    await ctx.edit(embeds=embeds[page], components=create_page_buttons(kind, key, page, len(embeds)))
+
+components.register_prefix(PREFIX, handle_page_button)
@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+"""
+    Token bucket rate limiter for asyncio code.
+
+    Parameters:
+    rate: float - Tokens added per second.
+    burst: int - Maximum number of tokens in the bucket.
+"""
+class RateLimiter:
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    """
+        Wait until a token is available and take it.
+    """
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
@@ -0,0 +1,50 @@
+import time
+
+from utils import metrics
+
+"""
+    Startup timing breakdown.
+
+    main.py marks the end of every startup phase; the breakdown is printed
+    once the bot is ready and exported as metrics, so time-to-ready can be
+    compared across releases. Import this module first so the first phase
+    covers every other import.
+"""
+started_at = time.perf_counter()
+# list of (phase, seconds)
+phases = []
+_last_mark = started_at
+_reported = False
+
+startup_phase_seconds = metrics.Gauge("kuki_startup_phase_seconds", "Seconds spent in each startup phase.", ("phase",))
+startup_seconds = metrics.Gauge("kuki_startup_seconds", "Seconds from process start to the bot being ready.")
+
+"""
+    Record the time since the previous mark as a phase. Ignored once the
+    breakdown was reported (e.g. on_ready firing again after a reconnect).
+
+    Parameters:
+    phase: str - Name of the phase that just ended.
+"""
+def mark(phase: str):
+    global _last_mark
+    if _reported:
+        return
+    now = time.perf_counter()
+    phases.append((phase, now - _last_mark))
+    startup_phase_seconds.set(now - _last_mark, phase=phase)
+    _last_mark = now
+
+"""
+    Print the breakdown of the phases marked so far. Only the first call prints.
+"""
+def report():
+    global _reported
+    if _reported:
+        return
+    _reported = True
+    total = _last_mark - started_at
+    startup_seconds.set(total)
+    print(f"Ready in {total:.2f}s")
+    for phase, seconds in phases:
+        print(f"  {phase:<24} {seconds:7.3f}s")
@@ -0,0 +1,40 @@
+import json
+import os
+
+"""
+    Directory used for locally persisted data (snapshots, indexes, manifests).
+"""
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+
+"""
+    Load a JSON file from the data directory.
+
+    Parameters:
+    name: str - File name inside DATA_DIR.
+    default - Value returned if the file does not exist or cannot be parsed.
+
+    Returns:
+    The decoded JSON document, or default.
+"""
+def load_json(name: str, default=None):
+    path = os.path.join(DATA_DIR, name)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+"""
+    Atomically write a JSON document to the data directory.
+
+    Parameters:
+    name: str - File name inside DATA_DIR.
+    data - JSON serializable document.
+"""
+def save_json(name: str, data):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
@@ -1,3 +1,4 @@
+import json
 import random
 import interactions
 from interactions import Button, ButtonStyle, CommandContext, ComponentContext, Interaction
@@ -36,21 +37,11 @@ def create_embed(
     embed.set_footer(text=f"Page {page} of {total_pages}" if page and total_pages else f"Page 1 of 1")
     return embed
 
-def create_page_buttons(custom_id: int):
-    buttons = []
-    prev = Button(
-        style=ButtonStyle.SECONDARY,
-        label="prev",
-        custom_id=str(custom_id),
-    )
-    next = Button(
-        style= ButtonStyle.PRIMARY,
-        label="next",
-        custom_id=str(int(custom_id) + 1),
-    )
-    buttons.append(prev)
-    buttons.append(next)
-    return buttons
+"""
+    Estimate the memory held by a list of embeds (size of their JSON payloads).
+"""
+def get_embeds_size(embeds):
+    return sum(len(json.dumps(getattr(embed, "_json", {}), default=str)) for embed in embeds)
 
 def create_show_details_button():
     more_details = Button(
@@ -59,31 +50,3 @@ def create_show_details_button():
         custom_id="show_details",
     )
     return more_details
-
-async def handle_page_buttons(ctx: ComponentContext, 
-                              buttons, 
-                              interaction_id: int, 
-                              embeds, 
-                              compareName=False):
-    idx = 0
-    # get current idx
-    for i, embed in enumerate(embeds):
-        if compareName:
-            c1 = embed.fields[0].name
-            c2 = ctx.message.embeds[0].fields[0].name
-        else:
-            c1 = embed.title
-            c2 = ctx.message.embeds[0].title
-        if c1 == c2:
-            idx = i
-            break
-    # prev
-    if str(ctx.custom_id) == str(interaction_id):
-        idx = idx - 1 if idx > 0 else len(embeds) - 1
-        await ctx.edit(embeds=embeds[idx], components=buttons)
-    # next
-    elif str(ctx.custom_id) == str(interaction_id + 1):
-        idx = idx + 1 if idx < len(embeds) - 1 else 0
-        await ctx.edit(embeds=embeds[idx], components=buttons)
-    else:
-        return